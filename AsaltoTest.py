@@ -1,9 +1,45 @@
 # Asalto testing framework
 # JC4004 Computational Intelligence 2025-26
 
-import copy
 import time
 
+# =================================================
+# Precomputed board tables for the referee
+#
+# Squares are (row, column) tuples on the cross-shaped part of the 7x7 board.
+# STEPS[sq]: squares one step away (diagonals only from squares where
+#            row % 2 == column % 2)
+# JUMPS[sq]: (over, land) pairs of a capture in one of those directions
+# REBEL_STEPS[sq]: the steps a rebel may take (never down, never further
+#                  away from the middle column)
+def on_board(row, col):
+  return 0 <= row < 7 and 0 <= col < 7 and (2 <= row <= 4 or 2 <= col <= 4)
+
+def in_fortress(square):
+  return square[0] < 3 and 1 < square[1] < 5
+
+STEPS = {}
+JUMPS = {}
+REBEL_STEPS = {}
+for _r in range(7):
+  for _c in range(7):
+    if not on_board(_r, _c):
+      continue
+    STEPS[(_r, _c)] = []
+    JUMPS[(_r, _c)] = []
+    REBEL_STEPS[(_r, _c)] = []
+    for _dr in (-1, 0, 1):
+      for _dc in (-1, 0, 1):
+        if (_dr == 0 and _dc == 0) or (_dr != 0 and _dc != 0 and _r % 2 != _c % 2):
+          continue
+        if not on_board(_r + _dr, _c + _dc):
+          continue
+        STEPS[(_r, _c)].append((_r + _dr, _c + _dc))
+        if on_board(_r + 2 * _dr, _c + 2 * _dc):
+          JUMPS[(_r, _c)].append(((_r + _dr, _c + _dc), (_r + 2 * _dr, _c + 2 * _dc)))
+        if _dr <= 0 and not (_dc < 0 and _c < 3) and not (_dc > 0 and _c > 3):
+          REBEL_STEPS[(_r, _c)].append((_r + _dr, _c + _dc))
+
 
 class Asalto:
 
@@ -12,7 +48,7 @@ class Asalto:
   def __init__(self, verbose=False):
 
     # Initialise a new game
-    self.board = [
+    self.set_board([
       [' ', ' ', '.', '.', '.', ' ', ' '],
       [' ', ' ', 'O', '.', 'O', ' ', ' '],
       ['R', 'R', '.', '.', '.', 'R', 'R'],
@@ -20,12 +56,17 @@ class Asalto:
       ['R', 'R', 'R', 'R', 'R', 'R', 'R'],
       [' ', ' ', 'R', 'R', 'R', ' ', ' '],
       [' ', ' ', 'R', 'R', 'R', ' ', ' ']
-    ]
+    ])
     self.officer_illegal = 0
     self.rebel_illegal = 0
     self.rounds_played = 0
     self.winner = ''
+    # Log the search statistics of players that keep them (Player.last_stats, e.g. Team20 with COLLECT_STATS)
+    self.log_stats = False
+    self.stats_log = []
     self.verbose = verbose
+    self.move_times = {'R': [], 'O': []}
+    self.rounds = 0
 
   # =================================================
   # Increase counter for illegal moves
@@ -35,6 +76,55 @@ class Asalto:
     else:
       self.officer_illegal += 1
 
+  # =================================================
+  # Set the board and recount the pieces (the referee keeps the counts up to date)
+  def set_board(self, board):
+    self.board = board
+    self.officers = []
+    self.rebel_count = 0
+    self.rebel_fortress_count = 0
+    for square in STEPS:
+      if board[square[0]][square[1]] == 'R':
+        self.rebel_count += 1
+        if in_fortress(square):
+          self.rebel_fortress_count += 1
+      elif board[square[0]][square[1]] == 'O':
+        self.officers.append(square)
+    self.officers.sort()
+
+  # =================================================
+  # Legal single moves (from, to) of the rebels
+  def rebel_moves(self):
+    moves = set()
+    for square, targets in REBEL_STEPS.items():
+      if self.board[square[0]][square[1]] == 'R':
+        for to in targets:
+          if self.board[to[0]][to[1]] == '.':
+            moves.add((square, to))
+    return moves
+
+  # =================================================
+  # Legal steps and first captures (from, to) of the officers
+  def officer_moves(self):
+    steps = set()
+    captures = set()
+    for square in self.officers:
+      for to in STEPS[square]:
+        if self.board[to[0]][to[1]] == '.':
+          steps.add((square, to))
+      for over, to in JUMPS[square]:
+        if self.board[over[0]][over[1]] == 'R' and self.board[to[0]][to[1]] == '.':
+          captures.add((square, to))
+    return steps, captures
+
+  # =================================================
+  # Test if the officer at square could capture a rebel
+  def can_capture(self, square):
+    for over, to in JUMPS[square]:
+      if self.board[over[0]][over[1]] == 'R' and self.board[to[0]][to[1]] == '.':
+        return True
+    return False
+
   # =================================================
   # Check if the move is valid and update the board
   def is_valid_move(self, is_rebel, moves):
@@ -43,167 +133,110 @@ class Asalto:
     self.rounds_played += 1
 
     # Test for valid number of moves and value of staring position
-    if len(moves) < 2:
+    if len(moves) < 2 or (len(moves) > 2 and is_rebel):
       self.increase_illegal_moves(is_rebel)
       return False
-    elif moves[0][0] < 0 or moves[0][0] >= len(self.board) or moves[0][1] < 0 or moves[0][1] >= len(self.board):
-      self.increase_illegal_moves(is_rebel)
-      return False
-    elif len(moves) > 2 and is_rebel:
-      self.increase_illegal_moves(is_rebel)
-      return False
-    elif self.board[moves[0][0]][moves[0][1]] != 'R' and is_rebel == True:
-      self.increase_illegal_moves(is_rebel)
-      return False
-    elif self.board[moves[0][0]][moves[0][1]] != 'O' and is_rebel == False:
-      self.increase_illegal_moves(is_rebel)
-      return False
-
-    # Initialise
-    new_board = copy.deepcopy(self.board)
-    captured = False
+    path = [(pos[0], pos[1]) for pos in moves]
+    start = path[0]
 
-    # Loop through moves to test their validity
-    for i in range(len(moves) - 1):
-      from_pos = moves[i]
-      to_pos = moves[i+1]
-
-      if from_pos[0] == to_pos[0] and from_pos[1] == to_pos[1]:
+    # Rebels make a single step
+    if is_rebel:
+      if (start, path[1]) not in self.rebel_moves():
         self.increase_illegal_moves(is_rebel)
         return False
-      if (from_pos[0] != to_pos[0] and from_pos[1] != to_pos[1]) and ((from_pos[0] % 2) != (from_pos[1] % 2)):
+      self.board[start[0]][start[1]] = '.'
+      self.board[path[1][0]][path[1][1]] = 'R'
+      self.rebel_fortress_count += in_fortress(path[1]) - in_fortress(start)
+      return True
+
+    if start not in self.officers:
+      self.increase_illegal_moves(is_rebel)
+      return False
+    steps, captures = self.officer_moves()
+    if (start, path[1]) in steps:
+
+      # Test if officer COULD capture a rebel: in this case, remove (huff) officer!
+      # The moving officer is huffed first, otherwise the first other officer that could capture
+      if captures:
+        for officer in [start] + [o for o in self.officers if o != start]:
+          if self.can_capture(officer):
+            self.board[officer[0]][officer[1]] = '.' # Huffing
+            self.officers.remove(officer)
+            return False
+
+      # You can only chain moves if you are capturing consecutively
+      if len(path) > 2:
         self.increase_illegal_moves(is_rebel)
         return False
-      elif to_pos[0] < 0 or to_pos[1] < 0 or to_pos[0] >= len(new_board) or to_pos[1] >= len(new_board):
+      self.board[start[0]][start[1]] = '.'
+      self.board[path[1][0]][path[1][1]] = 'O'
+      self.officers[self.officers.index(start)] = path[1]
+      self.officers.sort()
+      return True
+
+    # Otherwise every step must be a capture; captured rebels are removed at the end
+    captured = []
+    current = start
+    for to in path[1:]:
+      for over, land in JUMPS.get(current, ()):
+        if land == to:
+          break
+      else:
         self.increase_illegal_moves(is_rebel)
         return False
-      elif new_board[to_pos[0]][to_pos[1]] != '.':
+      if self.board[over[0]][over[1]] != 'R' or over in captured:
         self.increase_illegal_moves(is_rebel)
         return False
-      elif abs(from_pos[0] - to_pos[0]) > 2 or abs(from_pos[1] - to_pos[1]) > 2:
+      # The officer's own starting square and the captured squares are free again
+      if not (self.board[to[0]][to[1]] == '.' or to == start or to in captured):
         self.increase_illegal_moves(is_rebel)
         return False
-      elif abs(from_pos[0] - to_pos[0]) > 1 or abs(from_pos[1] - to_pos[1]) > 1:
-
-        # You can only move more than one step if you are a fox capturing a rebel
-        if is_rebel or (not captured and i > 0):
-          self.increase_illegal_moves(is_rebel)
-          return False
-        elif (abs(from_pos[0] - to_pos[0]) + abs(from_pos[1] - to_pos[1])) % 2 != 0:
-          self.increase_illegal_moves(is_rebel)
-          return False
-        mid_pos = [(from_pos[0] + to_pos[0]) // 2, (from_pos[1] + to_pos[1]) // 2]
-        if new_board[mid_pos[0]][mid_pos[1]] != 'R':
-          self.increase_illegal_moves(is_rebel)
-          return False
-        new_board[to_pos[0]][to_pos[1]] = new_board[from_pos[0]][from_pos[1]]
-        new_board[mid_pos[0]][mid_pos[1]] = '.'
-        new_board[from_pos[0]][from_pos[1]] = '.'
-        captured = True
-
-      else:
-
-        # You can only chain moves if you are capturing consecutively
-        if i > 0:
-          self.increase_illegal_moves(is_rebel)
-          return False
-
-        # Test if rebel moving away from fortress
-        if is_rebel:
-
-          # Test if rebel moving downwards
-          if to_pos[0] > from_pos[0]:
-            self.increase_illegal_moves(is_rebel)
-            return False
-
-          # Test if rebel on the left of the middle column and moving further to left
-          if to_pos[1] < from_pos[1] < 3:
-            self.increase_illegal_moves(is_rebel)
-            return False
-
-          # Test if rebel on the right of the middle column and moving further to right
-          if to_pos[1] > from_pos[1] > 3:
-            self.increase_illegal_moves(is_rebel)
-            return False
-
-        # Test if officer COULD capture a rebel: in this case, remove (huff) officer!
-        elif not captured:
-
-          officer_pos = [[from_pos[0],from_pos[1]]]
-          for i2 in range(len(self.board)):
-            for j2 in range(len(self.board[i2])):
-              if (i2 != from_pos[0] or j2 != from_pos[1]) and self.board[i2][j2] == 'O':
-                officer_pos.append([i2, j2])
-
-          # Can any of the officers capture?
-          for k in range(len(officer_pos)):
-            for i2 in range(max(officer_pos[k][0] - 1, 0), min(officer_pos[k][0] + 2, len(self.board))):
-              for j2 in range(max(officer_pos[k][1] - 1, 0), min(officer_pos[k][1] + 2, len(self.board))):
-                if (i2 == officer_pos[k][0] or j2 == officer_pos[k][1]) or (
-                          (officer_pos[k][0] % 2) == (officer_pos[k][1] % 2)):
-                  if self.board[i2][j2] == 'R':
-                    capture_pos = [i2 + i2 - officer_pos[k][0], j2 + j2 - officer_pos[k][1]]
-                    if (capture_pos[0] >= 0) and (capture_pos[0] < len(self.board)) and (capture_pos[1] >= 0) and (capture_pos[1] < len(self.board)):
-                      if self.board[capture_pos[0]][capture_pos[1]] == '.':
-                        self.board[officer_pos[k][0]][officer_pos[k][1]] = '.' # Huffing
-                        return False  # Officer can capture a rebel
-
-        # This move is legal
-        new_board[to_pos[0]][to_pos[1]] = new_board[from_pos[0]][from_pos[1]]
-        new_board[from_pos[0]][from_pos[1]] = '.'
-        captured = False
+      captured.append(over)
+      current = to
 
     # Legal move(s): update the board
-    self.board = new_board
+    self.board[start[0]][start[1]] = '.'
+    for over in captured:
+      self.board[over[0]][over[1]] = '.'
+      self.rebel_count -= 1
+      self.rebel_fortress_count -= in_fortress(over)
+    self.board[current[0]][current[1]] = 'O'
+    self.officers[self.officers.index(start)] = current
+    self.officers.sort()
     return True
 
   # =================================================
   # Check if the game is won by one player
   def check_win(self):
 
-    # Checks if the game is won by the officers
-    rebel_count = 0
-    rebel_fortress_count = 0
-    for i in range(len(self.board)):
-      for j in range(len(self.board[i])):
-        if self.board[i][j] == 'R':
-          rebel_count += 1
-          if i < 3 and 1 < j < 5:
-             rebel_fortress_count += 1
-
     # If less than 9 rebels left, the officers wins
-    if rebel_count < 9:
+    if self.rebel_count < 9:
       self.winner = 'O'
       return True
 
     # Checks if the game is won by the rebels
-    if rebel_fortress_count == 9:
+    if self.rebel_fortress_count == 9:
       self.winner = 'R'
       return True
 
-    officer_pos = []
-    for i in range(len(self.board)):
-      for j in range(len(self.board[i])):
-        if self.board[i][j] == 'O':
-          officer_pos.append([i,j])
-
-    # Can any of the officers move?
-    for k in range(len(officer_pos)):
-      for i in range(max(officer_pos[k][0] - 1, 0), min(officer_pos[k][0] + 2, len(self.board))):
-        for j in range(max(officer_pos[k][1] - 1, 0), min(officer_pos[k][1] + 2, len(self.board))):
-          if (i == officer_pos[k][0] or j == officer_pos[k][1]) or ((officer_pos[k][0] % 2) == (officer_pos[k][1] % 2)):
-            if self.board[i][j] == '.':
-              return False  # Officer can move one step
-            if self.board[i][j] == 'R':
-              capture_pos = [i + i - officer_pos[k][0], j + j - officer_pos[k][1]]
-              if (capture_pos[0] >= 0) and (capture_pos[0] < len(self.board)) and (capture_pos[1] >= 0) and (capture_pos[1] < len(self.board)):
-                if self.board[capture_pos[0]][capture_pos[1]] == '.':
-                  return False  # Officer can capture a rebel
+    # Can any of the officers move or capture?
+    steps, captures = self.officer_moves()
+    if steps or captures:
+      return False
 
     # The officers cannot move, the rebels win
     self.winner = 'R'
     return True
 
+  # =================================================
+  # Record the search statistics of the player's last move
+  def log_move_stats(self, player, is_rebel):
+    stats = getattr(player, 'last_stats', None)
+    if stats is not None:
+      self.stats_log.append(('R' if is_rebel else 'O', stats.as_dict()))
+      if self.verbose:
+        print(("Rebel" if is_rebel else "Officer") + " search: " + stats.summary())
+
   # =================================================
   # Play one round of the game between players 1 (goose) and 2 (fox)
   def play(self, rebel_player, officer_player):
@@ -219,23 +252,29 @@ class Asalto:
     while not game_over:
 
       # The rebel plays first
-      temp_board = copy.deepcopy(self.board)
+      temp_board = [row[:] for row in self.board]
       start_time = time.time()
       try:
         move = rebel_player.play_rebel(temp_board)
       except Exception as err:
-        print("Exception caught for rebel!")
+        if self.verbose:
+          print("Exception caught for rebel!")
         self.winner = 'O'
         game_over = True
       else:
         used_time = time.time() - start_time
+        self.move_times['R'].append(used_time)
+        if self.log_stats:
+          self.log_move_stats(rebel_player, True)
         if used_time > 10000: # This will 10 when testing the bots
-          print("Rebel exceeded time limit!")
+          if self.verbose:
+            print("Rebel exceeded time limit!")
           self.winner = 'O'
           game_over = True
         elif not self.is_valid_move(True, move):
-          print(f"Illegal move by rebel! Move: {move}") # Print the move
-          self.print_board() # Print the board state
+          if self.verbose:
+            print(f"Illegal move by rebel! Move: {move}") # Print the move
+            self.print_board() # Print the board state
           self.winner = 'O' # Usually illegal move means loss or penalty
           # game_over = True # Uncomment if you want to stop on illegal move
         elif self.check_win():
@@ -244,22 +283,28 @@ class Asalto:
       if not game_over:
 
         # The officer plays second
-        temp_board = copy.deepcopy(self.board)
+        temp_board = [row[:] for row in self.board]
         start_time = time.time()
         try:
           move = officer_player.play_officer(temp_board)
         except Exception as err:
-          print("Exception caught for officer!")
+          if self.verbose:
+            print("Exception caught for officer!")
           self.winner = 'R'
           game_over = True
         else:
           used_time = time.time() - start_time
+          self.move_times['O'].append(used_time)
+          if self.log_stats:
+            self.log_move_stats(officer_player, False)
           if used_time > 10000: # This will 10 when testing the bots
-            print("Officer exceeded time limit!")
+            if self.verbose:
+              print("Officer exceeded time limit!")
             self.winner = 'R'
             game_over = True
           elif not self.is_valid_move(False, move):
-            print("Illegal move by officer!")
+            if self.verbose:
+              print("Illegal move by officer!")
           elif self.check_win():
             game_over = True
 
@@ -278,6 +323,12 @@ class Asalto:
           self.winner = 'O'
         elif self.officer_illegal > self.officer_illegal:
           self.winner = 'R'
+    self.rounds = rounds_played
+
+    # Let the players stop background work (e.g. Team20 pondering)
+    for player in (rebel_player, officer_player):
+      if hasattr(player, 'close'):
+        player.close()
 
     # Game is over
     if self.verbose:
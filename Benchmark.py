@@ -0,0 +1,165 @@
+"""
+Search benchmark on a fixed set of positions.
+
+    python3 Benchmark.py --output bench.json
+    python3 Benchmark.py --depth 6 --compare bench.json
+    python3 Benchmark.py --depth 7 --no-pvs --no-lmr --output plain.json
+    python3 Benchmark.py --depth 7 --compare plain.json
+
+Every position in benchmark_positions.txt (opening, middlegame and endgame
+positions for both sides) is searched with get_best_rebel_move /
+get_best_officer_move at a fixed depth, with the opening book, the endgame
+tablebase and the officers' proof search off, a fresh SearchContext and a fixed random seed, so the node counts are reproducible
+and two runs of the same code search the same trees. For every position
+the Search.SearchStats of the move are recorded (nodes, evaluations, time
+to depth, nodes/sec, cutoffs and transposition table hits); the results
+are printed or written as JSON. --compare prints the change in nodes and
+time against an earlier result file. --no-pvs / --no-lmr switch off
+principal variation search / late move reductions (Search.USE_PVS /
+USE_LMR), so their effect on nodes-to-depth can be measured in one tree;
+--selective switches on selective rebel move generation
+(RebelAI.SELECTIVE_SEARCH).
+"""
+
+import json
+import os
+import random
+
+import Bitboard
+import RebelAI
+import OfficerAI
+import Search
+from Search import SearchContext, SearchStats
+
+POSITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_positions.txt')
+
+
+def load_positions(path=POSITIONS_PATH):
+    """Return (version, [(name, side, position text), ...])."""
+    version = None
+    positions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split()
+            if fields[0] == 'version':
+                version = int(fields[1])
+                continue
+            name, side, text = fields
+            if side not in ('R', 'O'):
+                raise ValueError("Bad side for %s: %s" % (name, side))
+            Bitboard.board_from_text(text)  # validate early
+            positions.append((name, side, text))
+    if version is None:
+        raise ValueError("No version line in " + path)
+    return version, positions
+
+
+def run_position(side, text, depth=None, seed=0):
+    """Search one position; returns its result record (without the name)."""
+    board = Bitboard.board_from_text(text)
+    context = SearchContext()
+    stats = SearchStats()
+    random.seed(seed)
+    if side == 'R':
+        depth = depth or RebelAI.MAX_DEPTH
+        move = RebelAI.get_best_rebel_move(board, context=context, depth=depth, stats=stats)
+    else:
+        depth = depth or OfficerAI.MAX_DEPTH
+        move = OfficerAI.get_best_officer_move(board, context=context, depth=depth, stats=stats)
+    record = {'side': side, 'move': move}
+    record.update(stats.as_dict())
+    return record
+
+
+def run_benchmark(path=POSITIONS_PATH, depth=None, verbose=True, pvs=True, lmr=True, selective=False):
+    version, positions = load_positions(path)
+    # The book, the tablebase and the proof search would answer some
+    # positions without (or before) the search being measured
+    book = (RebelAI.USE_OPENING_BOOK, OfficerAI.USE_OPENING_BOOK)
+    RebelAI.USE_OPENING_BOOK = OfficerAI.USE_OPENING_BOOK = False
+    shortcuts = (RebelAI.USE_TABLEBASE, OfficerAI.USE_TABLEBASE, OfficerAI.USE_PROOF_SEARCH)
+    RebelAI.USE_TABLEBASE = OfficerAI.USE_TABLEBASE = OfficerAI.USE_PROOF_SEARCH = False
+    search_options = (Search.USE_PVS, Search.USE_LMR)
+    Search.USE_PVS, Search.USE_LMR = pvs, lmr
+    selective_search = RebelAI.SELECTIVE_SEARCH
+    RebelAI.SELECTIVE_SEARCH = selective
+    results = []
+    try:
+        for name, side, text in positions:
+            record = {'name': name}
+            record.update(run_position(side, text, depth))
+            results.append(record)
+            if verbose:
+                print("%-28s %s depth %d: %9d nodes %8.3fs %8d nps  move %s"
+                      % (name, side, record['depth'], record['nodes'], record['time'],
+                         record['nps'], record['move']))
+    finally:
+        RebelAI.USE_OPENING_BOOK, OfficerAI.USE_OPENING_BOOK = book
+        RebelAI.USE_TABLEBASE, OfficerAI.USE_TABLEBASE, OfficerAI.USE_PROOF_SEARCH = shortcuts
+        Search.USE_PVS, Search.USE_LMR = search_options
+        RebelAI.SELECTIVE_SEARCH = selective_search
+    total_nodes = sum(r['nodes'] for r in results)
+    total_time = sum(r['time'] for r in results)
+    report = {
+        'positions_version': version,
+        'depth': depth,
+        'pvs': pvs,
+        'lmr': lmr,
+        'selective': selective,
+        'results': results,
+        'total': {
+            'nodes': total_nodes,
+            'time': round(total_time, 4),
+            'nps': round(total_nodes / total_time) if total_time > 0 else 0,
+        },
+    }
+    if verbose:
+        print("total: %d nodes %.3fs %d nps" % (total_nodes, total_time, report['total']['nps']))
+    return report
+
+
+def compare(report, baseline):
+    """Print nodes and time of `report` relative to an earlier report."""
+    if report['positions_version'] != baseline['positions_version']:
+        print("Warning: position set version %s vs %s" % (report['positions_version'], baseline['positions_version']))
+    old = dict((r['name'], r) for r in baseline['results'])
+    for r in report['results']:
+        b = old.get(r['name'])
+        if b is None or b['depth'] != r['depth']:
+            continue
+        print("%-28s nodes %+7.1f%%  time %+7.1f%%" % (
+            r['name'], percent(r['nodes'], b['nodes']), percent(r['time'], b['time'])))
+    print("%-28s nodes %+7.1f%%  time %+7.1f%%  nps %+7.1f%%" % (
+        'total', percent(report['total']['nodes'], baseline['total']['nodes']),
+        percent(report['total']['time'], baseline['total']['time']),
+        percent(report['total']['nps'], baseline['total']['nps'])))
+
+
+def percent(new, old):
+    return (new - old) * 100.0 / old if old else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search benchmark on fixed positions")
+    parser.add_argument('--depth', type=int, default=None, help="search depth (default: MAX_DEPTH of each side)")
+    parser.add_argument('--positions', default=POSITIONS_PATH)
+    parser.add_argument('--output', default=None, help="write the results as JSON to this file")
+    parser.add_argument('--compare', default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument('--no-pvs', action='store_true', help="search without principal variation search")
+    parser.add_argument('--no-lmr', action='store_true', help="search without late move reductions")
+    parser.add_argument('--selective', action='store_true', help="selective rebel move generation")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.positions, args.depth, pvs=not args.no_pvs, lmr=not args.no_lmr,
+                           selective=args.selective)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
@@ -0,0 +1,575 @@
+"""
+Bitboard engine for the Asalto search.
+
+The 33 playable squares of the cross-shaped board are numbered row by row
+(top-left to bottom-right) and each square is one bit of a Python int.
+A position is described by two masks, `rebels` and `officers`; the empty
+mask is derived from them. All neighbour / jump relations are precomputed
+once at import time, so move generation is a handful of mask lookups per
+piece instead of a scan of the 7x7 list-of-lists.
+
+Moves are tuples of square indices: (from, to) for a step or a single jump.
+Use `to_move_list` to convert them into the [[r, c], [r, c]] format expected
+by `Asalto.is_valid_move`.
+"""
+
+import random
+
+SIZE = 7
+
+# Playable squares of the cross, in row-major order
+SQUARES = [(r, c) for r in range(SIZE) for c in range(SIZE) if 2 <= r <= 4 or 2 <= c <= 4]
+NUM_SQUARES = len(SQUARES)
+SQUARE_INDEX = {rc: i for i, rc in enumerate(SQUARES)}
+FULL_MASK = (1 << NUM_SQUARES) - 1
+
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# Fortress: rows 0-2, columns 2-4
+FORTRESS_MASK = 0
+for _i, (_r, _c) in enumerate(SQUARES):
+    if _r < 3 and 1 < _c < 5:
+        FORTRESS_MASK |= 1 << _i
+
+INITIAL_BOARD = [
+    [' ', ' ', '.', '.', '.', ' ', ' '],
+    [' ', ' ', 'O', '.', 'O', ' ', ' '],
+    ['R', 'R', '.', '.', '.', 'R', 'R'],
+    ['R', 'R', 'R', 'R', 'R', 'R', 'R'],
+    ['R', 'R', 'R', 'R', 'R', 'R', 'R'],
+    [' ', ' ', 'R', 'R', 'R', ' ', ' '],
+    [' ', ' ', 'R', 'R', 'R', ' ', ' ']
+]
+
+
+def _directions_from(r, c):
+    """Diagonal steps are only allowed from squares where r and c have the same parity."""
+    if r % 2 == c % 2:
+        return DIRECTIONS
+    return [(dr, dc) for dr, dc in DIRECTIONS if dr == 0 or dc == 0]
+
+
+def _build_tables():
+    officer_steps = []
+    rebel_steps = []
+    jumps = []
+    jump_mid = [[-1] * NUM_SQUARES for _ in range(NUM_SQUARES)]
+    for i, (r, c) in enumerate(SQUARES):
+        officer_mask = 0
+        rebel_mask = 0
+        square_jumps = []
+        for dr, dc in _directions_from(r, c):
+            nr, nc = r + dr, c + dc
+            if (nr, nc) not in SQUARE_INDEX:
+                continue
+            j = SQUARE_INDEX[(nr, nc)]
+            officer_mask |= 1 << j
+            # Rebels never move away from the fortress
+            if not (nr > r or (c < 3 and nc < c) or (c > 3 and nc > c)):
+                rebel_mask |= 1 << j
+            jr, jc = r + 2 * dr, c + 2 * dc
+            if (jr, jc) in SQUARE_INDEX:
+                k = SQUARE_INDEX[(jr, jc)]
+                square_jumps.append((1 << j, 1 << k, k))
+                jump_mid[i][k] = j
+        officer_steps.append(officer_mask)
+        rebel_steps.append(rebel_mask)
+        jumps.append(tuple(square_jumps))
+    return officer_steps, rebel_steps, jumps, jump_mid
+
+
+# OFFICER_STEPS[i] / REBEL_STEPS[i]: mask of squares reachable with one step from i
+# JUMPS[i]: tuple of (over_bit, land_bit, land_index) for every capture direction from i
+# JUMP_MID[i][k]: index of the jumped square for a capture i -> k, or -1
+OFFICER_STEPS, REBEL_STEPS, JUMPS, JUMP_MID = _build_tables()
+
+# NEIGHBOURS_8[i] / NEIGHBOURS_4[i]: playable squares around i, ignoring the diagonal rule
+# (the evaluation functions count mobility and cohesion this way)
+NEIGHBOURS_8 = []
+for _r, _c in SQUARES:
+    _mask = 0
+    for _dr, _dc in DIRECTIONS:
+        if (_r + _dr, _c + _dc) in SQUARE_INDEX:
+            _mask |= 1 << SQUARE_INDEX[(_r + _dr, _c + _dc)]
+    NEIGHBOURS_8.append(_mask)
+
+NEIGHBOURS_4 = []
+for _r, _c in SQUARES:
+    _mask = 0
+    for _dr, _dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+        if (_r + _dr, _c + _dc) in SQUARE_INDEX:
+            _mask |= 1 << SQUARE_INDEX[(_r + _dr, _c + _dc)]
+    NEIGHBOURS_4.append(_mask)
+
+# Bottom row of the fortress, where the rebels enter it
+FORTRESS_ENTRY_MASK = 0
+for _i, (_r, _c) in enumerate(SQUARES):
+    if _r == 2 and 1 < _c < 5:
+        FORTRESS_ENTRY_MASK |= 1 << _i
+
+
+def within_distance(k):
+    """List of masks: for every square, the playable squares at most k king steps away (itself included)."""
+    masks = []
+    for r, c in SQUARES:
+        mask = 0
+        for j, (r2, c2) in enumerate(SQUARES):
+            if abs(r2 - r) <= k and abs(c2 - c) <= k:
+                mask |= 1 << j
+        masks.append(mask)
+    return masks
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(x):
+        return bin(x).count('1')
+
+
+# Left-right mirror about column 3. The rules (diagonals from squares with
+# r % 2 == c % 2, the c < 3 / c > 3 rebel restrictions, the fortress at
+# columns 2-4) and both evaluations are symmetric under c -> 6 - c.
+MIRROR_SQUARE = [SQUARE_INDEX[(r, SIZE - 1 - c)] for r, c in SQUARES]
+
+# MIRROR_BYTES[k][b]: mirror image of byte b placed at bits 8k..8k+7
+MIRROR_BYTES = []
+for _k in range((NUM_SQUARES + 7) // 8):
+    _table = []
+    for _b in range(256):
+        _mask = 0
+        for _j in range(8):
+            _sq = 8 * _k + _j
+            if _b >> _j & 1 and _sq < NUM_SQUARES:
+                _mask |= 1 << MIRROR_SQUARE[_sq]
+        _table.append(_mask)
+    MIRROR_BYTES.append(_table)
+
+
+def mirror_mask(mask):
+    """Mirror a square mask left-right (five table lookups)."""
+    t = MIRROR_BYTES
+    return (t[0][mask & 0xFF] | t[1][mask >> 8 & 0xFF] | t[2][mask >> 16 & 0xFF]
+            | t[3][mask >> 24 & 0xFF] | t[4][mask >> 32 & 0xFF])
+
+
+def mirror_move(move):
+    return tuple(MIRROR_SQUARE[sq] for sq in move)
+
+
+def canonical(rebels, officers, rebel_to_move=True):
+    """
+    Return (key, mirrored): key is the smaller Zobrist hash of the position
+    and its mirror image, mirrored is True if the mirror image was chosen.
+    """
+    h = zobrist_hash(rebels, officers, rebel_to_move)
+    hm = zobrist_hash(mirror_mask(rebels), mirror_mask(officers), rebel_to_move)
+    if hm < h:
+        return hm, True
+    return h, False
+
+
+# Row of every square (rebels never move to a higher row)
+SQUARE_ROW = [r for r, _ in SQUARES]
+
+
+def rebel_rows(rebels):
+    """Sum of the rows of all rebels. Never increases during a game."""
+    return sum(SQUARE_ROW[sq] for sq in iter_bits(rebels))
+
+
+# =================================================
+# Evaluation features kept up to date by Position.make / unmake
+#
+# RebelAI.evaluate_board and OfficerAI.evaluate_board are sums of
+# per-square terms (piece-square tables) plus a few interaction terms:
+#   REBEL_PST[sq]   RebelAI: fortress bonus 200 + (2 - r) * 20, minus 5 per
+#                   step of Manhattan distance to (1, 3)
+#   OFFICER_PST[sq] OfficerAI: +100 on the defense points (2, 2)-(2, 4),
+#                   minus 10 per step of Manhattan distance to (2, 3)
+#   pairs           orthogonally adjacent rebel pairs (RebelAI's neighbour
+#                   bonus counts each pair from both sides)
+#   mobility        empty squares around the officers, all 8 directions
+# RebelAI.evaluate_position / OfficerAI.evaluate_position combine them in O(1).
+
+REBEL_PST = []
+OFFICER_PST = []
+for _r, _c in SQUARES:
+    _value = -(abs(_r - 1) + abs(_c - 3)) * 5
+    if _r < 3 and 1 < _c < 5:
+        _value += 200 + (2 - _r) * 20
+    REBEL_PST.append(_value)
+    _value = -(abs(_r - 2) + abs(_c - 3)) * 10
+    if _r == 2 and 2 <= _c <= 4:
+        _value += 100
+    OFFICER_PST.append(_value)
+
+
+def rebel_pairs(rebels):
+    """Number of orthogonally adjacent rebel pairs."""
+    return sum(popcount(NEIGHBOURS_4[sq] & rebels) for sq in iter_bits(rebels)) // 2
+
+
+def officer_mobility(rebels, officers):
+    """Empty squares around all officers (8 directions, as in the evaluations)."""
+    empty = FULL_MASK & ~(rebels | officers)
+    return sum(popcount(NEIGHBOURS_8[sq] & empty) for sq in iter_bits(officers))
+
+
+def officer_freedom(rebels, officers):
+    """Fewest empty squares around any single officer (how close the most boxed-in officer is to being trapped)."""
+    empty = FULL_MASK & ~(rebels | officers)
+    return min((popcount(NEIGHBOURS_8[sq] & empty) for sq in iter_bits(officers)), default=8)
+
+
+# Zobrist keys (fixed seed so every process and every run agrees on the hashes)
+_zobrist_rng = random.Random(20251)
+ZOBRIST_REBEL = [_zobrist_rng.getrandbits(64) for _ in range(NUM_SQUARES)]
+ZOBRIST_OFFICER = [_zobrist_rng.getrandbits(64) for _ in range(NUM_SQUARES)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)  # XOR-ed in when the officers are to move
+
+# Keys of the mirror image: the hash of the mirrored position, updated with the same squares
+ZOBRIST_REBEL_MIRROR = [ZOBRIST_REBEL[MIRROR_SQUARE[sq]] for sq in range(NUM_SQUARES)]
+ZOBRIST_OFFICER_MIRROR = [ZOBRIST_OFFICER[MIRROR_SQUARE[sq]] for sq in range(NUM_SQUARES)]
+
+
+def zobrist_hash(rebels, officers, rebel_to_move=True):
+    h = 0 if rebel_to_move else ZOBRIST_SIDE
+    for sq in iter_bits(rebels):
+        h ^= ZOBRIST_REBEL[sq]
+    for sq in iter_bits(officers):
+        h ^= ZOBRIST_OFFICER[sq]
+    return h
+
+
+def iter_bits(mask):
+    """Yield the square index of every set bit, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# =================================================
+# Conversion between the list board and bitboards
+
+def from_board(board):
+    """Return (rebels, officers) masks for a 7x7 list board."""
+    rebels = 0
+    officers = 0
+    for i, (r, c) in enumerate(SQUARES):
+        cell = board[r][c]
+        if cell == 'R':
+            rebels |= 1 << i
+        elif cell == 'O':
+            officers |= 1 << i
+    return rebels, officers
+
+
+def to_board(rebels, officers):
+    """Build a 7x7 list board from bitboards."""
+    board = [[' '] * SIZE for _ in range(SIZE)]
+    for i, (r, c) in enumerate(SQUARES):
+        bit = 1 << i
+        if rebels & bit:
+            board[r][c] = 'R'
+        elif officers & bit:
+            board[r][c] = 'O'
+        else:
+            board[r][c] = '.'
+    return board
+
+
+def board_from_text(text):
+    """
+    Parse the compact board notation used by the tools: the seven rows
+    separated by '/', each row listing only its squares on the cross, e.g.
+    the start position is '.../O.O/RR...RR/RRRRRRR/RRRRRRR/RRR/RRR'.
+    """
+    rows = text.strip().split('/')
+    if len(rows) != SIZE:
+        raise ValueError("Expected 7 rows: " + text)
+    board = [[' '] * SIZE for _ in range(SIZE)]
+    for r, row in enumerate(rows):
+        cols = [c for c in range(SIZE) if (r, c) in SQUARE_INDEX]
+        if len(row) != len(cols) or any(cell not in 'RO.' for cell in row):
+            raise ValueError("Bad row %d: %r" % (r, row))
+        for c, cell in zip(cols, row):
+            board[r][c] = cell
+    return board
+
+
+def board_to_text(board):
+    return '/'.join(''.join(board[r][c] for c in range(SIZE) if (r, c) in SQUARE_INDEX)
+                    for r in range(SIZE))
+
+
+def to_move_list(move):
+    """(from, to, ...) square indices -> [[r, c], [r, c], ...]"""
+    return [list(SQUARES[sq]) for sq in move]
+
+
+def from_move_list(move):
+    """[[r, c], [r, c], ...] -> (from, to, ...) square indices"""
+    return tuple(SQUARE_INDEX[(pos[0], pos[1])] for pos in move)
+
+
+# =================================================
+# Move generation
+
+def rebel_moves(rebels, officers):
+    empty = FULL_MASK & ~(rebels | officers)
+    moves = []
+    bb = rebels
+    while bb:
+        low = bb & -bb
+        sq = low.bit_length() - 1
+        bb ^= low
+        targets = REBEL_STEPS[sq] & empty
+        while targets:
+            t = targets & -targets
+            moves.append((sq, t.bit_length() - 1))
+            targets ^= t
+    return moves
+
+
+def officer_moves(rebels, officers):
+    empty = FULL_MASK & ~(rebels | officers)
+    moves = []
+    bb = officers
+    while bb:
+        low = bb & -bb
+        sq = low.bit_length() - 1
+        bb ^= low
+        targets = OFFICER_STEPS[sq] & empty
+        while targets:
+            t = targets & -targets
+            moves.append((sq, t.bit_length() - 1))
+            targets ^= t
+    return moves
+
+
+def officer_captures(rebels, officers):
+    empty = FULL_MASK & ~(rebels | officers)
+    captures = []
+    bb = officers
+    while bb:
+        low = bb & -bb
+        sq = low.bit_length() - 1
+        bb ^= low
+        for over_bit, land_bit, land in JUMPS[sq]:
+            if rebels & over_bit and empty & land_bit:
+                captures.append((sq, land))
+    return captures
+
+
+def officer_capture_chains(rebels, officers):
+    """
+    Every maximal capture of the officers as a (from, land, land, ...) tuple.
+    As in Asalto.is_valid_move an officer may keep jumping within one move
+    while it captures; the captured rebels are removed at the end of the
+    move, so none can be jumped twice and their squares, like the officer's
+    own starting square, are free to land on. A chain ends when the officer
+    has no further capture.
+
+    The chains of an officer are walked depth first, each prefix carrying
+    its capture state (landing square, rebels left). A state reached again
+    by jumping in another order is not expanded a second time: its
+    continuations, and the positions they lead to, are already listed.
+    """
+    chains = []
+    empty = FULL_MASK & ~(rebels | officers)
+    bb = officers
+    while bb:
+        low = bb & -bb
+        sq = low.bit_length() - 1
+        bb ^= low
+        stack = [((sq, land), rebels ^ over_bit)
+                 for over_bit, land_bit, land in JUMPS[sq]
+                 if rebels & over_bit and empty & land_bit]
+        if not stack:
+            continue
+        free = empty | low
+        seen = set()
+        while stack:
+            path, left = stack.pop()
+            landing = free | (rebels ^ left)
+            extended = False
+            for over_bit, land_bit, land in JUMPS[path[-1]]:
+                if left & over_bit and landing & land_bit:
+                    extended = True
+                    state = (left ^ over_bit) << 6 | land
+                    if state not in seen:
+                        seen.add(state)
+                        stack.append((path + (land,), left ^ over_bit))
+            if not extended:
+                chains.append(path)
+    return chains
+
+
+def is_capture(move):
+    """True for an officer capture: a single jump or a chain of them."""
+    return len(move) > 2 or JUMP_MID[move[0]][move[1]] >= 0
+
+
+def officer_can_move(rebels, officers):
+    """True if any officer has a step or a capture (the rebels win otherwise)."""
+    empty = FULL_MASK & ~(rebels | officers)
+    bb = officers
+    while bb:
+        low = bb & -bb
+        sq = low.bit_length() - 1
+        bb ^= low
+        if OFFICER_STEPS[sq] & empty:
+            return True
+        for over_bit, land_bit, _ in JUMPS[sq]:
+            if rebels & over_bit and empty & land_bit:
+                return True
+    return False
+
+
+def apply(rebels, officers, move):
+    """Return the (rebels, officers) masks after `move`."""
+    frm, to = move[0], move[-1]
+    frm_bit = 1 << frm
+    if officers & frm_bit:
+        for i in range(len(move) - 1):
+            mid = JUMP_MID[move[i]][move[i + 1]]
+            if mid >= 0:
+                rebels &= ~(1 << mid)
+        # A chain may end where it started
+        officers ^= frm_bit ^ (1 << to)
+    else:
+        rebels ^= frm_bit | (1 << to)
+    return rebels, officers
+
+
+def winner(rebels):
+    """Static win check matching RebelAI/OfficerAI.check_winner."""
+    if popcount(rebels) < 9:
+        return 'O'
+    if popcount(rebels & FORTRESS_MASK) == 9:
+        return 'R'
+    return None
+
+
+# =================================================
+# Mutable position for the search
+
+class Position:
+    """
+    Mutable search position. `make` plays a move in place and returns an undo
+    token; `unmake(token)` restores the moved piece and any captured rebels.
+    Both are O(1), so a whole search shares one Position object.
+
+    The following are updated incrementally by make / unmake:
+    - `hash`: Zobrist key of the position including the side to move
+    - `mirror_hash`: key of the left-right mirror image (see `canonical_key`)
+    - `rows`: sum of the rebels' rows (together with the rebel count it tells
+      which positions can still be reached, see TranspositionTable.set_reachable)
+    - `rebel_pst`, `officer_pst`, `pairs`, `mobility`: evaluation features
+      (see REBEL_PST / OFFICER_PST above)
+    """
+    __slots__ = ('rebels', 'officers', 'hash', 'mirror_hash', 'rows',
+                 'rebel_pst', 'officer_pst', 'pairs', 'mobility')
+
+    def __init__(self, rebels=0, officers=0, rebel_to_move=True):
+        self.rebels = rebels
+        self.officers = officers
+        self.hash = zobrist_hash(rebels, officers, rebel_to_move)
+        self.mirror_hash = zobrist_hash(mirror_mask(rebels), mirror_mask(officers), rebel_to_move)
+        self.rows = rebel_rows(rebels)
+        self.rebel_pst = sum(REBEL_PST[sq] for sq in iter_bits(rebels))
+        self.officer_pst = sum(OFFICER_PST[sq] for sq in iter_bits(officers))
+        self.pairs = rebel_pairs(rebels)
+        self.mobility = officer_mobility(rebels, officers)
+
+    @classmethod
+    def from_board(cls, board, rebel_to_move=True):
+        rebels, officers = from_board(board)
+        return cls(rebels, officers, rebel_to_move)
+
+    def to_board(self):
+        return to_board(self.rebels, self.officers)
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.assign(self)
+        return pos
+
+    def assign(self, other):
+        """Copy the state of `other` into this position (e.g. after an aborted search)."""
+        self.rebels = other.rebels
+        self.officers = other.officers
+        self.hash = other.hash
+        self.mirror_hash = other.mirror_hash
+        self.rows = other.rows
+        self.rebel_pst = other.rebel_pst
+        self.officer_pst = other.officer_pst
+        self.pairs = other.pairs
+        self.mobility = other.mobility
+
+    def canonical_key(self):
+        """(key, mirrored) for caches shared between a position and its mirror image."""
+        if self.mirror_hash < self.hash:
+            return self.mirror_hash, True
+        return self.hash, False
+
+    def make(self, move):
+        frm, to = move[0], move[-1]
+        # 0 for a capture chain that ends on its starting square
+        move_mask = (1 << frm) ^ (1 << to)
+        saved = (self.hash, self.mirror_hash, self.rows, self.rebel_pst,
+                 self.officer_pst, self.pairs, self.mobility)
+        rebels = self.rebels
+        if self.officers >> frm & 1:
+            captured = 0
+            h = self.hash ^ ZOBRIST_SIDE ^ ZOBRIST_OFFICER[frm] ^ ZOBRIST_OFFICER[to]
+            hm = self.mirror_hash ^ ZOBRIST_SIDE ^ ZOBRIST_OFFICER_MIRROR[frm] ^ ZOBRIST_OFFICER_MIRROR[to]
+            for i in range(len(move) - 1):
+                mid = JUMP_MID[move[i]][move[i + 1]]
+                if mid >= 0:
+                    captured |= 1 << mid
+                    rebels ^= 1 << mid
+                    h ^= ZOBRIST_REBEL[mid]
+                    hm ^= ZOBRIST_REBEL_MIRROR[mid]
+                    self.rows -= SQUARE_ROW[mid]
+                    self.rebel_pst -= REBEL_PST[mid]
+                    self.pairs -= popcount(NEIGHBOURS_4[mid] & rebels)
+            self.rebels = rebels
+            self.officers ^= move_mask
+            self.officer_pst += OFFICER_PST[to] - OFFICER_PST[frm]
+            self.hash = h
+            self.mirror_hash = hm
+            is_officer = True
+        else:
+            rebels ^= 1 << frm
+            self.pairs += popcount(NEIGHBOURS_4[to] & rebels) - popcount(NEIGHBOURS_4[frm] & rebels)
+            self.rebels = rebels | (1 << to)
+            self.hash ^= ZOBRIST_SIDE ^ ZOBRIST_REBEL[frm] ^ ZOBRIST_REBEL[to]
+            self.mirror_hash ^= ZOBRIST_SIDE ^ ZOBRIST_REBEL_MIRROR[frm] ^ ZOBRIST_REBEL_MIRROR[to]
+            self.rows += SQUARE_ROW[to] - SQUARE_ROW[frm]
+            self.rebel_pst += REBEL_PST[to] - REBEL_PST[frm]
+            captured = 0
+            is_officer = False
+
+        # Officer mobility: at most two officers, a couple of table lookups each
+        empty = FULL_MASK & ~(self.rebels | self.officers)
+        mobility = 0
+        bb = self.officers
+        while bb:
+            low = bb & -bb
+            mobility += popcount(NEIGHBOURS_8[low.bit_length() - 1] & empty)
+            bb ^= low
+        self.mobility = mobility
+        return (move_mask, captured, is_officer, saved)
+
+    def unmake(self, token):
+        move_mask, captured, is_officer, saved = token
+        if is_officer:
+            self.officers ^= move_mask
+            self.rebels ^= captured
+        else:
+            self.rebels ^= move_mask
+        (self.hash, self.mirror_hash, self.rows, self.rebel_pst,
+         self.officer_pst, self.pairs, self.mobility) = saved
@@ -0,0 +1,235 @@
+"""
+Headless match runner: play many games between two player modules.
+
+    python3 Match.py Team20 TeamDQN --games 100 --workers 8 --output match.jsonl
+
+Games alternate colours (even games: the first module plays the rebels,
+odd games: the second one does) and are spread over a process pool. Each
+game uses AsaltoTest.Asalto without per-round printing and fresh Player
+instances. The result of every game is appended to the output file as one
+JSON object per line as soon as it finishes:
+
+    {"game": 3, "rebel": "TeamDQN", "officer": "Team20", "winner": "O",
+     "winner_module": "Team20", "rounds": 57, "rebel_illegal": 0,
+     "officer_illegal": 0, "rebel_move_times": [...], "officer_move_times": [...]}
+
+`winner` is 'R', 'O' or '' (no winner after 1000 rounds); move times are in
+seconds. With --stats the records also hold the Search.SearchStats of every
+move of players that collect them (rebel_stats / officer_stats).
+
+With --sprt the match is a sequential probability ratio test of
+H0: elo(a - b) = elo0 against H1: elo(a - b) = elo1. It stops as soon as the
+log-likelihood ratio leaves [log(beta / (1 - alpha)), log((1 - beta) / alpha)],
+so clear results do not use up all --games:
+
+    python3 Match.py Team20 Team20_old --sprt --elo0 0 --elo1 50 --games 2000 --workers 8
+"""
+
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from AsaltoTest import Asalto
+
+
+def play_game(game, rebel_module, officer_module, seed=None, stats=False):
+    """
+    Play one game in this process and return its result record.
+    stats: switch on COLLECT_STATS in the player modules that have it and
+    add the search statistics of every move to the record.
+    """
+    if seed is not None:
+        random.seed(seed + game)
+    modules = [__import__(rebel_module), __import__(officer_module)]
+    if stats:
+        for module in modules:
+            if hasattr(module, 'COLLECT_STATS'):
+                module.COLLECT_STATS = True
+    rebel = getattr(modules[0], "Player")()
+    officer = getattr(modules[1], "Player")()
+    asalto = Asalto(verbose=False)
+    asalto.log_stats = stats
+    asalto.play(rebel, officer)
+    winner = asalto.winner
+    result = {
+        'game': game,
+        'rebel': rebel_module,
+        'officer': officer_module,
+        'winner': winner,
+        'winner_module': rebel_module if winner == 'R' else officer_module if winner == 'O' else None,
+        'rounds': asalto.rounds,
+        'rebel_illegal': asalto.rebel_illegal,
+        'officer_illegal': asalto.officer_illegal,
+        'rebel_move_times': [round(t, 4) for t in asalto.move_times['R']],
+        'officer_move_times': [round(t, 4) for t in asalto.move_times['O']],
+    }
+    if stats:
+        result['rebel_stats'] = [entry for side, entry in asalto.stats_log if side == 'R']
+        result['officer_stats'] = [entry for side, entry in asalto.stats_log if side == 'O']
+    return result
+
+
+def game_colours(game, player_a, player_b):
+    """(rebel_module, officer_module) for game number `game`."""
+    return (player_a, player_b) if game % 2 == 0 else (player_b, player_a)
+
+
+class MatchScore:
+    """Running score of player_a against player_b."""
+
+    def __init__(self, player_a, player_b):
+        self.player_a = player_a
+        self.player_b = player_b
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.sprt_result = None  # set by run_match when an SPRT is used
+
+    def add(self, result):
+        if not result['winner']:
+            self.draws += 1
+        elif (result['winner'] == 'R') == (result['game'] % 2 == 0):
+            # player_a plays the rebels in even games (see game_colours)
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    def summary(self):
+        return "%s vs %s: +%d -%d =%d (%d games)" % (
+            self.player_a, self.player_b, self.wins, self.losses, self.draws, self.games())
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class SPRT:
+    """
+    Sequential probability ratio test on the match score.
+
+    Uses the usual normal approximation of the log-likelihood ratio for
+    win/draw/loss results: with mean score s and per-game variance var over
+    n games, LLR = n * (s1 - s0) * (2 * s - s0 - s1) / (2 * var), where s0 and
+    s1 are the expected scores at elo0 and elo1. The mean and variance include
+    one pseudo draw: without it a one-sided result (only wins or only losses)
+    has variance 0 and the test could never stop. A clearly stronger or
+    weaker engine is accepted or rejected quickly:
+
+    >>> score = MatchScore('a', 'b')
+    >>> score.wins = 200
+    >>> SPRT(0, 10).update(score)
+    'H1'
+    >>> score.wins, score.losses = 0, 200
+    >>> SPRT(0, 10).update(score)
+    'H0'
+    """
+
+    def __init__(self, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.trajectory = []  # (games, llr) after every game
+
+    def llr(self, score):
+        n = score.games()
+        if n == 0:
+            return 0.0
+        # One pseudo draw keeps the variance above 0
+        draws = score.draws + 1
+        s = (score.wins + 0.5 * draws) / (n + 1)
+        var = (score.wins * (1 - s) ** 2 + draws * (0.5 - s) ** 2 + score.losses * s ** 2) / (n + 1)
+        s0 = expected_score(self.elo0)
+        s1 = expected_score(self.elo1)
+        return n * (s1 - s0) * (2 * s - s0 - s1) / (2 * var)
+
+    def update(self, score):
+        """Record the LLR after the latest game; returns 'H0', 'H1' or None (continue)."""
+        llr = self.llr(score)
+        self.trajectory.append((score.games(), llr))
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+    def summary(self):
+        llr = self.trajectory[-1][1] if self.trajectory else 0.0
+        return "LLR %.2f [%.2f, %.2f] (elo0 %g, elo1 %g)" % (llr, self.lower, self.upper, self.elo0, self.elo1)
+
+
+def run_match(player_a, player_b, games, workers=1, output=None, seed=None, verbose=True, sprt=None, stats=False):
+    """
+    Play `games` games between two player modules over `workers` processes.
+    Results are written to `output` (JSON lines) as games finish; returns
+    the MatchScore from player_a's point of view.
+
+    With an SPRT the match stops once a bound is crossed (games still running
+    are finished but not counted); the decision is left in score.sprt_result
+    ('H0', 'H1' or None) and the LLR after every game in sprt.trajectory.
+    """
+    score = MatchScore(player_a, player_b)
+    out = open(output, 'w') if output else None
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for game in range(games):
+                rebel_module, officer_module = game_colours(game, player_a, player_b)
+                futures.append(pool.submit(play_game, game, rebel_module, officer_module, seed, stats))
+            for future in as_completed(futures):
+                result = future.result()
+                score.add(result)
+                status = score.summary()
+                if sprt is not None:
+                    score.sprt_result = sprt.update(score)
+                    result['llr'] = round(sprt.trajectory[-1][1], 4)
+                    status += " | " + sprt.summary()
+                if out is not None:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                if verbose:
+                    print("game %d: %s (R) vs %s (O): %s in %d rounds | %s"
+                          % (result['game'], result['rebel'], result['officer'],
+                             result['winner'] or '-', result['rounds'], status))
+                if score.sprt_result is not None:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+    finally:
+        if out is not None:
+            out.close()
+    if verbose:
+        print("%s in %.1fs" % (score.summary(), time.time() - start))
+        if sprt is not None:
+            print("SPRT: %s -> %s" % (sprt.summary(), score.sprt_result or 'inconclusive'))
+            print("LLR trajectory: " + " ".join("%d:%.2f" % point for point in sprt.trajectory))
+    return score
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play a headless match between two player modules")
+    parser.add_argument('player_a', help="module with a Player class, e.g. Team20")
+    parser.add_argument('player_b', help="module with a Player class, e.g. TeamDQN")
+    parser.add_argument('--games', type=int, default=2, help="number of games (colours alternate)")
+    parser.add_argument('--workers', type=int, default=1, help="number of games played in parallel")
+    parser.add_argument('--output', default=None, help="JSON-lines file for the per-game results")
+    parser.add_argument('--seed', type=int, default=None, help="seed game i with seed + i")
+    parser.add_argument('--stats', action='store_true', help="add the search statistics of every move to the results")
+    parser.add_argument('--sprt', action='store_true', help="stop early once the SPRT accepts H0 or H1 (--games is the maximum)")
+    parser.add_argument('--elo0', type=float, default=0.0, help="SPRT: elo difference under H0")
+    parser.add_argument('--elo1', type=float, default=10.0, help="SPRT: elo difference under H1")
+    parser.add_argument('--alpha', type=float, default=0.05, help="SPRT: false positive rate")
+    parser.add_argument('--beta', type=float, default=0.05, help="SPRT: false negative rate")
+    args = parser.parse_args()
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
+    run_match(args.player_a, args.player_b, args.games, args.workers, args.output, args.seed, sprt=sprt, stats=args.stats)
@@ -0,0 +1,107 @@
+"""
+Move ordering for the alpha-beta search.
+
+Alpha-beta prunes best when the best move is tried first. MoveOrderer sorts
+the children of a node in stages:
+
+1. the transposition table / principal variation move,
+2. captures, ranked by how many rebels they take (a capture is a whole
+   chain of jumps, see Bitboard.officer_capture_chains),
+3. killer moves (quiet moves that caused a cutoff at the same ply),
+4. the remaining quiet moves by history score.
+
+The orderer also counts how often a cutoff came from the first move tried,
+which is the usual measure of ordering quality (> 90% is good).
+Pass NoOrdering() to a Searcher to search in generation order.
+"""
+
+import Bitboard
+
+NUM_KILLERS = 2
+MAX_PLY = 64
+
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 26
+
+
+class MoveOrderer:
+
+    def __init__(self):
+        self.killers = [[None] * NUM_KILLERS for _ in range(MAX_PLY)]
+        # history[side][from * NUM_SQUARES + to], side 0 = rebels, 1 = officers
+        self.history = [[0] * (Bitboard.NUM_SQUARES * Bitboard.NUM_SQUARES) for _ in range(2)]
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.cutoff_nodes = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self, ply_shift=0):
+        """
+        Keep what was learned, but let older history fade.
+        ply_shift > 0 keeps the killers of the previous search, moved up by
+        that many plies (the new root was ply `ply_shift` of the old tree).
+        """
+        for table in self.history:
+            for i in range(len(table)):
+                table[i] >>= 1
+        if ply_shift > 0:
+            self.killers = self.killers[ply_shift:] + [[None] * NUM_KILLERS for _ in range(ply_shift)]
+        else:
+            self.killers = [[None] * NUM_KILLERS for _ in range(MAX_PLY)]
+        self.reset_stats()
+
+    def order(self, pos, moves, ply, tt_move, rebel_to_move):
+        """Return `moves` sorted best-first. `tt_move` may be None or illegal (hash collision)."""
+        if len(moves) < 2:
+            return moves
+        n = Bitboard.NUM_SQUARES
+        history = self.history[0 if rebel_to_move else 1]
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = TT_MOVE_SCORE
+            elif not rebel_to_move and Bitboard.is_capture(move):
+                score = CAPTURE_SCORE + len(move) - 1
+            elif move in killers:
+                score = KILLER_SCORE
+            else:
+                score = history[move[0] * n + move[-1]]
+            scored.append((score, move))
+        # Stable sort keeps generation (or shuffled root) order among equal scores
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, pos, move, ply, depth, rebel_to_move, is_first):
+        self.cutoff_nodes += 1
+        if is_first:
+            self.first_move_cutoffs += 1
+        if not rebel_to_move and Bitboard.is_capture(move):
+            return  # captures are already ordered first
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[0 if rebel_to_move else 1][move[0] * Bitboard.NUM_SQUARES + move[-1]] += depth * depth
+
+    def stats(self):
+        return {
+            'cutoff_nodes': self.cutoff_nodes,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoffs / self.cutoff_nodes if self.cutoff_nodes else 0.0,
+        }
+
+
+class NoOrdering(MoveOrderer):
+    """Search children in generation order (baseline for comparisons)."""
+
+    def order(self, pos, moves, ply, tt_move, rebel_to_move):
+        return moves
+
+    def record_cutoff(self, pos, move, ply, depth, rebel_to_move, is_first):
+        self.cutoff_nodes += 1
+        if is_first:
+            self.first_move_cutoffs += 1
@@ -1,121 +1,175 @@
 import random
-import copy
 import math
 import time
 
+import Bitboard
+import OpeningBook
+import ParallelSearch
+import ProofSearch
+import Tablebase
+from Search import Searcher, MAX_ITERATIVE_DEPTH
+from TimeManager import TimeManager
+
 # Configuration options
 MAX_DEPTH = 5
 TIME_LIMIT = 9.0
+USE_OPENING_BOOK = True # Consult opening_book.bin before searching
+USE_TABLEBASE = True # endgame_tablebase.bin: play decided endgames perfectly and score them exactly in the search
+USE_PROOF_SEARCH = True # Before minimax, try to prove a forced capture sequence when one is plausible (ProofSearch)
 
-def get_best_officer_move(board, use_iterative=False):
+def get_best_officer_move(board, use_iterative=False, tt=None, workers=1, context=None, depth=None, stats=None):
     """
     Calculate the best move for the Officer.
     Decide whether to use fixed depth or iterative deepening based on use_iterative.
+    The search runs on bitboards; the returned move is still in [[r, c], [r, c]] format.
+    tt: optional TranspositionTable to reuse; a fresh one is created if None.
+    workers: if > 1, split the root moves over that many processes (ParallelSearch).
+    context: optional Search.SearchContext that keeps the TT, history tables and PV between moves.
+    depth: search depth for fixed depth mode (maximum depth for iterative deepening); default MAX_DEPTH / unlimited.
+    stats: optional Search.SearchStats to fill with node counts, cutoffs and per-depth times.
     """
     start_time = time.time()
+    if stats is not None:
+        # Stats are timed from the start of the call
+        stats.reset()
+    pos = Bitboard.Position.from_board(board, rebel_to_move=False)
     
-    # Mandatory capture rule
-    captures = get_all_officer_captures(board)
+    # Mandatory capture rule: whole capture chains are one move
+    captures = Bitboard.officer_capture_chains(pos.rebels, pos.officers)
     if captures:
         if len(captures) == 1:
-            return captures[0]
+            return Bitboard.to_move_list(captures[0])
         moves = captures
     else:
-        moves = get_all_officer_moves(board)
+        moves = Bitboard.officer_moves(pos.rebels, pos.officers)
         
     if not moves:
         return []
         
+    # Play the book move if the position is in the opening book
+    if USE_OPENING_BOOK:
+        book_move = OpeningBook.probe(pos, False, moves)
+        if book_move is not None:
+            return Bitboard.to_move_list(book_move)
+    
+    # Play the tablebase move if the position is won or lost
+    if USE_TABLEBASE:
+        table_move = Tablebase.best_move(pos, False, moves)
+        if table_move is not None:
+            return Bitboard.to_move_list(table_move)
+    
+    # Play a proved forced capture sequence without searching
+    if USE_PROOF_SEARCH:
+        budget = ProofSearch.proof_budget(pos, bool(captures))
+        if budget:
+            line = ProofSearch.forced_capture_line(pos, max_nodes=budget, stats=stats)
+            if line:
+                return Bitboard.to_move_list(line[0])
+    
+    # Shuffle first so that equally ranked moves keep a random order
     random.shuffle(moves)
     
-    best_move = moves[0]
+    ply_shift = 0
+    orderer = None
+    if context is not None:
+        tt = context.tt
+        orderer = context.orderer
+        ply_shift = context.start_search(pos)
     
+    # Only check the clock in iterative deepening mode: TIME_LIMIT is the hard
+    # limit, the TimeManager sets the budget for this move
+    searcher = Searcher('O', evaluate_position, tt,
+                        start_time if use_iterative else None, TIME_LIMIT, orderer)
+    searcher.stats = stats
+    searcher.tablebase = Tablebase.get_tablebase() if USE_TABLEBASE else None
     if use_iterative:
+        searcher.time_manager = TimeManager(TIME_LIMIT, start_time)
+        searcher.time_manager.allocate(pos, len(moves))
+    moves = searcher.order_root(pos, moves, rebel_to_move=False, ply_shift=ply_shift)
+    
+    if workers > 1:
+        # Root-split parallel search
+        best_move = ParallelSearch.parallel_best_move(
+            pos, moves, False, 'O', evaluate_position,
+            None if use_iterative else (depth or MAX_DEPTH), start_time, TIME_LIMIT, workers,
+            searcher.time_manager.budget if use_iterative else None)
+        completed_depth = 0 if use_iterative else (depth or MAX_DEPTH)
+    elif use_iterative:
         # Iterative deepening mode
-        current_depth = 1
-        max_possible_depth = 10
-        try:
-            while current_depth <= max_possible_depth:
-                alpha = -math.inf
-                beta = math.inf
-                current_best_move = None
-                current_best_score = -math.inf
-                
-                for move in moves:
-                    if time.time() - start_time > TIME_LIMIT:
-                        raise TimeoutError
-                    
-                    new_board = apply_move(board, move)
-                    score = minimax(new_board, current_depth - 1, False, alpha, beta, start_time)
-                    
-                    if score > current_best_score:
-                        current_best_score = score
-                        current_best_move = move
-                    
-                    alpha = max(alpha, score)
-                    if beta <= alpha:
-                        break
-                
-                best_move = current_best_move
-                current_depth += 1
-        except TimeoutError:
-            pass
+        best_move, _, completed_depth = searcher.iterative_deepening(pos, moves, depth or MAX_ITERATIVE_DEPTH)
     else:
         # Fixed depth mode
-        best_score = -math.inf
-        alpha = -math.inf
-        beta = math.inf
-        
-        for move in moves:
-            new_board = apply_move(board, move)
-            score = minimax(new_board, MAX_DEPTH - 1, False, alpha, beta, None)
-            
-            if score > best_score:
-                best_score = score
-                best_move = move
-                
-            alpha = max(alpha, score)
-            if beta <= alpha:
-                break
-                
-    return best_move
-
-def minimax(board, depth, is_maximizing, alpha, beta, start_time):
-    # Check time if iterative deepening is enabled
-    if start_time and (time.time() - start_time > TIME_LIMIT):
-        raise TimeoutError
+        best_move, _, _ = searcher.search_root(pos, moves, depth or MAX_DEPTH, -math.inf, math.inf)
+        completed_depth = depth or MAX_DEPTH
+    
+    if stats is not None:
+        # Collect stats before the PV walk adds its own table probes
+        stats.finish(searcher, completed_depth)
+    if context is not None:
+        context.finish_search(searcher, pos, best_move)
+    return Bitboard.to_move_list(best_move)
 
-    winner = check_winner(board)
-    if winner == 'O': return 10000 + depth
-    if winner == 'R': return -10000 - depth
-    if depth == 0:
-        return evaluate_board(board)
+def iterate_best_officer_move(board, token=None, context=None, max_depth=MAX_ITERATIVE_DEPTH, time_limit=None):
+    """
+    Anytime search: a generator that yields (depth, move, score) after every
+    completed iterative deepening depth, move in [[r, c], [r, c]] format.
+    token: optional Search.CancellationToken; cancel() from any thread stops the
+    search inside the current depth and the generator simply ends (no exception),
+    so the last result yielded stays valid. The caller may also stop iterating
+    after any result.
+    time_limit: optional limit in seconds.
+    A forced capture, single move, book, tablebase or proved capture move is yielded once as (0, move, None).
+    """
+    start_time = time.time()
+    pos = Bitboard.Position.from_board(board, rebel_to_move=False)
+    captures = Bitboard.officer_capture_chains(pos.rebels, pos.officers)
+    moves = captures if captures else Bitboard.officer_moves(pos.rebels, pos.officers)
+    if not moves:
+        return
+    if len(moves) == 1:
+        yield 0, Bitboard.to_move_list(moves[0]), None
+        return
+    if USE_OPENING_BOOK:
+        book_move = OpeningBook.probe(pos, False, moves)
+        if book_move is not None:
+            yield 0, Bitboard.to_move_list(book_move), None
+            return
+    if USE_TABLEBASE:
+        table_move = Tablebase.best_move(pos, False, moves)
+        if table_move is not None:
+            yield 0, Bitboard.to_move_list(table_move), None
+            return
+    if USE_PROOF_SEARCH:
+        budget = ProofSearch.proof_budget(pos, bool(captures))
+        if budget:
+            line = ProofSearch.forced_capture_line(pos, max_nodes=budget)
+            if line:
+                yield 0, Bitboard.to_move_list(line[0]), None
+                return
     
-    if is_maximizing:
-        max_eval = -math.inf
-        captures = get_all_officer_captures(board)
-        moves = captures if captures else get_all_officer_moves(board)
-        if not moves: return -10000
-        
-        for move in moves:
-            new_board = apply_move(board, move)
-            eval = minimax(new_board, depth - 1, False, alpha, beta, start_time)
-            max_eval = max(max_eval, eval)
-            alpha = max(alpha, eval)
-            if beta <= alpha: break
-        return max_eval
-    else:
-        min_eval = math.inf
-        moves = get_all_rebel_moves(board)
-        if not moves: return 10000
-        
-        for move in moves:
-            new_board = apply_move(board, move)
-            eval = minimax(new_board, depth - 1, True, alpha, beta, start_time)
-            min_eval = min(min_eval, eval)
-            beta = min(beta, eval)
-            if beta <= alpha: break
-        return min_eval
+    random.shuffle(moves)
+    tt = None
+    orderer = None
+    ply_shift = 0
+    if context is not None:
+        tt = context.tt
+        orderer = context.orderer
+        ply_shift = context.start_search(pos)
+    
+    searcher = Searcher('O', evaluate_position, tt,
+                        start_time if time_limit else None, time_limit, orderer)
+    searcher.stop_event = token
+    searcher.tablebase = Tablebase.get_tablebase() if USE_TABLEBASE else None
+    moves = searcher.order_root(pos, moves, rebel_to_move=False, ply_shift=ply_shift)
+    best_move = None
+    try:
+        for depth, move, score in searcher.iterate(pos, moves, max_depth):
+            best_move = move
+            yield depth, Bitboard.to_move_list(move), score
+    finally:
+        # Record the PV even if the caller stopped early
+        if context is not None and best_move is not None:
+            context.finish_search(searcher, pos, best_move)
 
 def evaluate_board(board):
     """
@@ -164,17 +218,29 @@ def evaluate_board(board):
     
     return score
 
+def evaluate_position(pos):
+    """
+    Same score as evaluate_board, from the features Position keeps up to date (O(1)).
+    """
+    rebel_count = Bitboard.popcount(pos.rebels)
+    if rebel_count < 9: return 10000
+    return ((24 - rebel_count) * 500
+            - Bitboard.popcount(pos.rebels & Bitboard.FORTRESS_MASK) * 200
+            + pos.officer_pst + pos.mobility * 20)
+
 # Helper functions same as RebelAI, copied here for independence (or extract to utils.py)
 def apply_move(board, move):
-    new_board = copy.deepcopy(board)
-    start, end = move[0], move[1]
+    new_board = [row[:] for row in board]
+    start, end = move[0], move[-1]
     piece = new_board[start[0]][start[1]]
-    new_board[end[0]][end[1]] = piece
     new_board[start[0]][start[1]] = '.'
-    if abs(start[0] - end[0]) > 1 or abs(start[1] - end[1]) > 1:
-        mid_r = (start[0] + end[0]) // 2
-        mid_c = (start[1] + end[1]) // 2
-        new_board[mid_r][mid_c] = '.'
+    # A capture chain removes the rebel jumped by every step
+    for frm, to in zip(move, move[1:]):
+        if abs(frm[0] - to[0]) > 1 or abs(frm[1] - to[1]) > 1:
+            mid_r = (frm[0] + to[0]) // 2
+            mid_c = (frm[1] + to[1]) // 2
+            new_board[mid_r][mid_c] = '.'
+    new_board[end[0]][end[1]] = piece
     return new_board
 
 def check_winner(board):
@@ -223,18 +289,38 @@ def get_all_officer_moves(board):
     return moves
 
 def get_all_officer_captures(board):
+    """
+    Every maximal capture chain of the officers, as in Asalto.is_valid_move:
+    an officer keeps jumping while it can capture, and the captured rebels
+    are only removed after the move (they cannot be jumped twice; their
+    squares and the starting square are free to land on).
+    """
     captures = []
     rows = len(board)
     cols = len(board[0])
+    directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
     for r in range(rows):
         for c in range(cols):
             if board[r][c] == 'O':
-                directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-                for dr, dc in directions:
-                    mr, mc = r + dr, c + dc
-                    nr, nc = r + 2*dr, c + 2*dc
-                    if 0 <= nr < rows and 0 <= nc < cols:
-                        if dr != 0 and dc != 0 and (r % 2) != (c % 2): continue
-                        if board[mr][mc] == 'R' and board[nr][nc] == '.':
-                            captures.append([[r, c], [nr, nc]])
+                seen = set()
+                stack = [([[r, c]], frozenset())]
+                while stack:
+                    path, captured = stack.pop()
+                    cr, cc = path[-1]
+                    # Same square with the same rebels captured: already expanded
+                    if ((cr, cc), captured) in seen: continue
+                    seen.add(((cr, cc), captured))
+                    extended = False
+                    for dr, dc in directions:
+                        mr, mc = cr + dr, cc + dc
+                        nr, nc = cr + 2*dr, cc + 2*dc
+                        if 0 <= nr < rows and 0 <= nc < cols:
+                            if dr != 0 and dc != 0 and (cr % 2) != (cc % 2): continue
+                            if board[mr][mc] != 'R' or (mr, mc) in captured: continue
+                            # The starting square and the captured squares are free again
+                            if board[nr][nc] == '.' or (nr, nc) == (r, c) or (nr, nc) in captured:
+                                stack.append((path + [[nr, nc]], captured | {(mr, mc)}))
+                                extended = True
+                    if not extended and len(path) > 1:
+                        captures.append(path)
     return captures
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+Opening book for the fixed Asalto starting position.
+
+Every game starts from the same board, so the first moves of both sides can
+be searched once, offline, much deeper than the 9s limit allows. Build the
+book with:
+
+    python3 OpeningBook.py --plies 4 --depth 7
+
+The builder walks every position reachable in `plies` plies from the start
+(all rebel moves, all officer moves / mandatory capture chains), searches
+each one to `depth` and writes the best move for the side to move. A record
+holds a single from / to step, so a position whose best move is a capture
+chain of several jumps is left out of the book and searched in the game.
+
+File format (little endian): an 8 byte header b'ASBK' + uint32 record count,
+then records sorted by key:
+
+    uint64 key, uint8 depth, uint8 from, uint8 to, pad, int16 score
+
+Positions are stored mirror-canonicalised: the key is the smaller of the
+Zobrist hashes of the position and of its left-right mirror image, and the
+move is stored for that orientation (see Bitboard.canonical). Symmetric
+openings therefore share one record.
+
+The book is opened on the first probe and memory-mapped, so importing the
+AI modules costs nothing and only the pages that are looked up get read.
+"""
+
+import mmap
+import os
+import struct
+
+import Bitboard
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+MAGIC = b'ASBK'
+HEADER = struct.Struct('<4sI')
+RECORD = struct.Struct('<QBBBxh')
+
+_book = None
+_book_loaded = False
+
+
+class Book:
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an Asalto opening book: " + path)
+
+    def record(self, i):
+        return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+
+    def lookup(self, key):
+        """Binary search for `key`; returns (depth, from, to, score) or None."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            rec = self.record(mid)
+            if rec[0] < key:
+                lo = mid + 1
+            elif rec[0] > key:
+                hi = mid
+            else:
+                return rec[1:]
+        return None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def get_book(path=BOOK_PATH):
+    """Open the book on first use; returns None if there is no book file."""
+    global _book, _book_loaded
+    if not _book_loaded:
+        _book_loaded = True
+        if os.path.exists(path):
+            try:
+                _book = Book(path)
+            except (OSError, ValueError) as err:
+                print("OpeningBook: could not open " + path + ": " + str(err))
+                _book = None
+    return _book
+
+
+def probe(pos, rebel_to_move, legal_moves):
+    """Return the book move (square indices) for `pos`, or None."""
+    book = get_book()
+    if book is None:
+        return None
+    key, mirrored = Bitboard.canonical(pos.rebels, pos.officers, rebel_to_move)
+    rec = book.lookup(key)
+    if rec is None:
+        return None
+    move = (rec[1], rec[2])
+    if mirrored:
+        move = Bitboard.mirror_move(move)
+    # Guard against a stale book or a hash collision
+    if move not in legal_moves:
+        return None
+    return move
+
+
+# =================================================
+# Offline builder
+
+def generate_moves(rebels, officers, rebel_to_move):
+    if rebel_to_move:
+        return Bitboard.rebel_moves(rebels, officers)
+    captures = Bitboard.officer_capture_chains(rebels, officers)
+    return captures if captures else Bitboard.officer_moves(rebels, officers)
+
+
+def build_book(path=BOOK_PATH, plies=4, depth=7, verbose=True):
+    # Imported here: the AI modules import this module for probing
+    import RebelAI
+    import OfficerAI
+    from Search import Searcher
+
+    rebels, officers = Bitboard.from_board(Bitboard.INITIAL_BOARD)
+    frontier = [(rebels, officers, True)]
+    seen = set()
+    entries = {}
+    for ply in range(plies + 1):
+        next_frontier = []
+        for rebels, officers, rebel_to_move in frontier:
+            key, mirrored = Bitboard.canonical(rebels, officers, rebel_to_move)
+            if key in seen or Bitboard.winner(rebels) is not None:
+                continue
+            seen.add(key)
+            moves = generate_moves(rebels, officers, rebel_to_move)
+            if not moves:
+                continue
+
+            # Search the canonical orientation so the stored move needs no conversion
+            if mirrored:
+                pos = Bitboard.Position(Bitboard.mirror_mask(rebels), Bitboard.mirror_mask(officers), rebel_to_move)
+            else:
+                pos = Bitboard.Position(rebels, officers, rebel_to_move)
+            if rebel_to_move:
+                searcher = Searcher('R', RebelAI.evaluate_position)
+            else:
+                searcher = Searcher('O', OfficerAI.evaluate_position)
+            root_moves = searcher.order_root(pos, generate_moves(pos.rebels, pos.officers, rebel_to_move), rebel_to_move)
+            move, score, done = searcher.iterative_deepening(pos, root_moves, depth)
+            if len(move) == 2:
+                entries[key] = (done, move[0], move[1], max(-32768, min(32767, int(score))))
+            if verbose:
+                print("ply %d: %s to move, %s score %d (depth %d)%s"
+                      % (ply, 'R' if rebel_to_move else 'O', Bitboard.to_move_list(move), score, done,
+                         '' if len(move) == 2 else ", capture chain not stored"))
+
+            if ply < plies:
+                for child in moves:
+                    child_rebels, child_officers = Bitboard.apply(rebels, officers, child)
+                    next_frontier.append((child_rebels, child_officers, not rebel_to_move))
+        frontier = next_frontier
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(entries)))
+        for key in sorted(entries):
+            f.write(RECORD.pack(key, *entries[key]))
+    if verbose:
+        print("Wrote %d positions to %s" % (len(entries), path))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the Asalto opening book")
+    parser.add_argument('--plies', type=int, default=4, help="book depth in plies from the start position")
+    parser.add_argument('--depth', type=int, default=7, help="search depth for every book position")
+    parser.add_argument('--output', default=BOOK_PATH)
+    args = parser.parse_args()
+    build_book(args.output, args.plies, args.depth)
@@ -0,0 +1,101 @@
+"""
+Parallel root search.
+
+The root moves are split round-robin (after ordering, so every worker gets
+a share of the promising moves) over a ProcessPoolExecutor. Each worker runs
+the normal Searcher on its subset with the same deadline and, in iterative
+mode, the time budget the TimeManager allocated for the move, and reports the
+result of every completed depth. The parent then picks the deepest depth
+that every worker finished and returns the best move at that depth, so the
+scores being compared were all searched equally deep.
+
+The pool is created on first use and kept for the rest of the game, so only
+the first move pays the process start-up cost. Each worker process also
+keeps its own transposition table between moves.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import Bitboard
+from Search import Searcher
+from TimeManager import TimeManager
+
+_pool = None
+_pool_workers = 0
+
+# Per-process transposition tables, one per side
+_worker_searchers = {}
+
+
+def get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+    _pool = None
+    _pool_workers = 0
+
+
+def _search_subset(rebels, officers, rebel_to_move, side, evaluate, moves, depth, start_time, time_limit,
+                   budget=None):
+    """
+    Worker: search `moves` from the given position.
+    depth=None means iterative deepening until the deadline; `budget` (seconds)
+    then stops it like the TimeManager of a single-process search.
+    Returns a list of (depth, move, score) for every completed depth.
+    """
+    pos = Bitboard.Position(rebels, officers, rebel_to_move)
+    searcher = _worker_searchers.get(side)
+    if searcher is None:
+        searcher = Searcher(side, evaluate)
+        _worker_searchers[side] = searcher
+    searcher.start_time = start_time if depth is None else None
+    searcher.time_limit = time_limit
+    searcher.time_manager = None
+    if depth is None and budget is not None:
+        searcher.time_manager = TimeManager(time_limit, start_time)
+        searcher.time_manager.budget = budget
+    moves = searcher.order_root(pos, moves, rebel_to_move)
+    if depth is None:
+        searcher.iterative_deepening(pos, moves)
+        return searcher.iterations
+    move, score, _ = searcher.search_root(pos, moves, depth, -math.inf, math.inf)
+    return [(depth, move, score)]
+
+
+def parallel_best_move(pos, moves, rebel_to_move, side, evaluate, depth, start_time, time_limit, workers,
+                       budget=None):
+    """
+    Search the root `moves` over `workers` processes and return the best move
+    (as square indices). depth=None runs iterative deepening until the deadline,
+    or within `budget` seconds (TimeManager.allocate) when one is given.
+    """
+    workers = min(workers, len(moves))
+    pool = get_pool(workers)
+    futures = []
+    for w in range(workers):
+        subset = moves[w::workers]
+        futures.append(pool.submit(_search_subset, pos.rebels, pos.officers, rebel_to_move,
+                                   side, evaluate, subset, depth, start_time, time_limit, budget))
+    results = [f.result() for f in futures]
+
+    # Deepest depth completed by every worker
+    common_depth = min((r[-1][0] if r else 0) for r in results)
+    best_move = moves[0]
+    best_score = -math.inf
+    for iterations in results:
+        for d, move, score in iterations:
+            if d == common_depth and score > best_score:
+                best_score = score
+                best_move = move
+    return best_move
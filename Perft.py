@@ -0,0 +1,224 @@
+"""
+Perft: count the leaf nodes of the game tree to a fixed depth.
+
+    python3 Perft.py --depth 5
+    python3 Perft.py --depth 4 --generator all --divide
+    python3 Perft.py --depth 3 --position '.../O.O/RR.R.RR/RRRRRRR/RR.RRRR/RRR/RRR' --officers --verify
+
+The same tree is walked by every move generator in GENERATORS, so their
+counts must agree; a difference points at a move generation bug, and the
+nodes/sec figure measures raw generation speed:
+
+    list      RebelAI / OfficerAI list functions (get_all_*, apply_move)
+    bitboard  Bitboard generators with Position.make / unmake
+
+Officers must capture when they can, and a capture is a whole chain of
+jumps (every maximal chain, once per resulting position, as in the search).
+A position where the game is over has no moves. --divide prints the count
+below every root move; --verify checks at every node of the tree that the
+generators produce exactly the moves Asalto.is_valid_move accepts.
+Positions use the notation of Bitboard.board_from_text.
+"""
+
+import time
+
+import Bitboard
+import RebelAI
+from Asalto import Asalto
+
+
+# =================================================
+# List-based generators
+
+def list_moves(board, rebel_to_move):
+    if rebel_to_move:
+        return RebelAI.get_all_rebel_moves(board)
+    # Mandatory capture rule
+    captures = RebelAI.get_all_officer_captures(board)
+    return captures if captures else RebelAI.get_all_officer_moves(board)
+
+
+def perft_list(board, rebel_to_move, depth):
+    if depth == 0:
+        return 1
+    if RebelAI.check_winner(board) is not None:
+        return 0
+    moves = list_moves(board, rebel_to_move)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        nodes += perft_list(RebelAI.apply_move(board, move), not rebel_to_move, depth - 1)
+    return nodes
+
+
+def divide_list(board, rebel_to_move, depth):
+    if RebelAI.check_winner(board) is not None:
+        return []
+    return [(move, perft_list(RebelAI.apply_move(board, move), not rebel_to_move, depth - 1))
+            for move in list_moves(board, rebel_to_move)]
+
+
+# =================================================
+# Bitboard generators
+
+def bitboard_moves(pos, rebel_to_move):
+    if rebel_to_move:
+        return Bitboard.rebel_moves(pos.rebels, pos.officers)
+    captures = Bitboard.officer_capture_chains(pos.rebels, pos.officers)
+    return captures if captures else Bitboard.officer_moves(pos.rebels, pos.officers)
+
+
+def perft_bitboard(pos, rebel_to_move, depth):
+    if depth == 0:
+        return 1
+    if Bitboard.winner(pos.rebels) is not None:
+        return 0
+    moves = bitboard_moves(pos, rebel_to_move)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = pos.make(move)
+        nodes += perft_bitboard(pos, not rebel_to_move, depth - 1)
+        pos.unmake(undo)
+    return nodes
+
+
+def divide_bitboard(board, rebel_to_move, depth):
+    pos = Bitboard.Position.from_board(board, rebel_to_move)
+    if Bitboard.winner(pos.rebels) is not None:
+        return []
+    results = []
+    for move in bitboard_moves(pos, rebel_to_move):
+        undo = pos.make(move)
+        results.append((Bitboard.to_move_list(move), perft_bitboard(pos, not rebel_to_move, depth - 1)))
+        pos.unmake(undo)
+    return results
+
+
+# name -> divide(board, rebel_to_move, depth) returning [(move as [[r, c], [r, c], ...], nodes), ...]
+GENERATORS = {
+    'list': divide_list,
+    'bitboard': divide_bitboard,
+}
+
+
+def perft(generator, board, rebel_to_move, depth):
+    """Leaf count with the named generator."""
+    if depth == 0:
+        return 1
+    return sum(nodes for _, nodes in GENERATORS[generator](board, rebel_to_move, depth))
+
+
+# =================================================
+# Cross-check against the referee
+
+def referee_accepts(board, rebel_to_move, path):
+    game = Asalto()
+    game.set_board([row[:] for row in board])
+    return game.is_valid_move(rebel_to_move, [list(square) for square in path])
+
+
+def move_key(path):
+    """(from, to, captured squares): moves with the same key lead to the same position."""
+    captured = [((a[0] + b[0]) // 2, (a[1] + b[1]) // 2)
+                for a, b in zip(path, path[1:]) if max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 2]
+    return (tuple(path[0]), tuple(path[-1]), tuple(sorted(captured)))
+
+
+def referee_moves(board, rebel_to_move):
+    """
+    Every move that Asalto.is_valid_move accepts in `board`, as move_key
+    tuples. Captures are extended one jump at a time for as long as the
+    referee accepts the longer move; only the maximal chains are kept.
+    """
+    piece = 'R' if rebel_to_move else 'O'
+    moves = set()
+    for frm in Bitboard.SQUARES:
+        if board[frm[0]][frm[1]] != piece:
+            continue
+        stack = [[frm]]
+        while stack:
+            path = stack.pop()
+            last = path[-1]
+            extended = False
+            for to in Bitboard.SQUARES:
+                distance = max(abs(to[0] - last[0]), abs(to[1] - last[1]))
+                if distance > 2 or (len(path) > 1 and distance < 2):
+                    continue
+                if referee_accepts(board, rebel_to_move, path + [to]):
+                    extended = True
+                    if distance == 2:
+                        stack.append(path + [to])
+                    else:
+                        moves.add(move_key(path + [to]))
+            if not extended and len(path) > 1:
+                moves.add(move_key(path))
+    return moves
+
+
+def verify(board, rebel_to_move, depth, mismatches=None):
+    """
+    Walk the tree to `depth` and compare, at every node, the moves of each
+    generator with the referee's. Returns a list of (position, side,
+    generator, missing, extra) for the nodes that differ.
+    """
+    if mismatches is None:
+        mismatches = []
+    if depth == 0 or RebelAI.check_winner(board) is not None:
+        return mismatches
+    expected = referee_moves(board, rebel_to_move)
+    for name, divide in GENERATORS.items():
+        moves = [move for move, _ in divide(board, rebel_to_move, 1)]
+        generated = set(move_key(move) for move in moves)
+        # Two moves with the same result are a duplicate
+        if generated != expected or len(generated) != len(moves):
+            mismatches.append((Bitboard.board_to_text(board), 'R' if rebel_to_move else 'O', name,
+                               sorted(expected - generated), sorted(generated - expected)))
+    for move in list_moves(board, rebel_to_move):
+        verify(RebelAI.apply_move(board, move), not rebel_to_move, depth - 1, mismatches)
+    return mismatches
+
+
+def format_move(move):
+    return '-'.join("%d%d" % (pos[0], pos[1]) for pos in move)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Count leaf nodes of the Asalto game tree")
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--position', default=Bitboard.board_to_text(Bitboard.INITIAL_BOARD),
+                        help="board in Bitboard.board_from_text notation (default: start position)")
+    parser.add_argument('--officers', action='store_true', help="officers to move (default: rebels)")
+    parser.add_argument('--generator', default='all', choices=sorted(GENERATORS) + ['all'])
+    parser.add_argument('--divide', action='store_true', help="print the count below every root move")
+    parser.add_argument('--verify', action='store_true', help="check the generators against Asalto.is_valid_move")
+    args = parser.parse_args()
+
+    board = Bitboard.board_from_text(args.position)
+    rebel_to_move = not args.officers
+    names = sorted(GENERATORS) if args.generator == 'all' else [args.generator]
+
+    counts = {}
+    for name in names:
+        start = time.time()
+        results = GENERATORS[name](board, rebel_to_move, args.depth) if args.depth > 0 else []
+        nodes = sum(n for _, n in results) if args.depth > 0 else 1
+        elapsed = time.time() - start
+        counts[name] = nodes
+        if args.divide:
+            for move, n in sorted(results):
+                print("  %s: %d" % (format_move(move), n))
+        print("%-9s depth %d: %d nodes in %.3fs (%.0f nodes/sec)"
+              % (name, args.depth, nodes, elapsed, nodes / elapsed if elapsed > 0 else 0))
+    if len(set(counts.values())) > 1:
+        print("MISMATCH between generators: %s" % counts)
+
+    if args.verify:
+        mismatches = verify(board, rebel_to_move, args.depth)
+        for position, side, name, missing, extra in mismatches:
+            print("%s %s to move, %s: missing %s extra %s" % (position, side, name, missing, extra))
+        print("verify: %s" % ("OK" if not mismatches else "%d mismatching nodes" % len(mismatches)))
@@ -0,0 +1,122 @@
+"""
+Pondering: search on the opponent's time.
+
+After Team20.Player returns a move, the Ponderer plays that move and the
+opponent reply predicted by the principal variation on a copy of the
+position, and starts an iterative deepening search from there in a
+background thread. It shares the player's SearchContext, so everything it
+finds stays in the transposition table.
+
+On the next play_* call the ponder search is stopped first (the Searcher
+checks a CancellationToken every NODES_PER_CHECK nodes, so this takes a few
+milliseconds).
+If the opponent played the predicted reply, the finished ponder result can
+be returned at once, or the normal search continues with a warm table.
+Otherwise the ponder work is simply discarded.
+
+A ponder search stops by itself after PONDER_TIME_LIMIT seconds, and
+Player.close (called by AsaltoTest when a game ends) stops it for good, so
+it never keeps running into the next game.
+
+Note that a thread shares the interpreter with the opponent when both bots
+run in the same process (as in Asalto.py), so pondering is off by default.
+"""
+
+import threading
+import time
+
+import Bitboard
+from Search import Searcher, CancellationToken
+
+# Longest a ponder search runs: about one opponent move
+PONDER_TIME_LIMIT = 10.0
+
+
+class Ponderer:
+
+    def __init__(self):
+        self.thread = None
+        self.stop_event = CancellationToken()
+        self.root = None
+        self.searcher = None
+        # (depth, move, score) of the deepest completed ponder iteration
+        self.result = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, context, side, evaluate, board, our_move, max_depth, time_limit=PONDER_TIME_LIMIT):
+        """
+        Ponder the position reached after `our_move` (list format) and the
+        reply predicted by context.last_pv, for at most `time_limit` seconds.
+        Does nothing without a prediction.
+        """
+        self.stop()
+        reply = context.predicted_reply()
+        if reply is None or not our_move:
+            return
+        rebel_to_move = side == 'R'
+        pos = Bitboard.Position.from_board(board, rebel_to_move)
+        pos.make(Bitboard.from_move_list(our_move))
+        pos.make(reply)
+        self.root = pos.hash
+        self.searcher = None
+        self.result = None
+        self.stop_event = CancellationToken()
+        self.thread = threading.Thread(target=self._run,
+                                       args=(context, side, evaluate, pos, max_depth, time_limit, self.stop_event),
+                                       daemon=True)
+        self.thread.start()
+
+    def _run(self, context, side, evaluate, pos, max_depth, time_limit, stop_event):
+        rebel_to_move = side == 'R'
+        if Bitboard.winner(pos.rebels) is not None:
+            return
+        searcher = Searcher(side, evaluate, context.tt, time.time(), time_limit, context.orderer)
+        searcher.stop_event = stop_event
+        moves = searcher.generate_moves(pos, rebel_to_move)
+        if not moves:
+            return
+        ply_shift = context.start_search(pos)
+        # The real search from this root must not shift the killers again
+        context.expected_root = None
+        moves = searcher.order_root(pos, moves, rebel_to_move, ply_shift)
+        self.searcher = searcher
+        # Ends when max_depth is reached, the time limit passes or stop_event is set
+        for result in searcher.iterate(pos, moves, max_depth):
+            self.result = result
+
+    def stop(self):
+        """Cancel the ponder search (if any) and wait for the thread to finish."""
+        if self.thread is not None:
+            self.stop_event.cancel()
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        """Stop pondering at the end of a game and forget the pondered position."""
+        self.stop()
+        self.root = None
+        self.searcher = None
+        self.result = None
+
+    def take_result(self, context, board, rebel_to_move, min_depth):
+        """
+        Stop pondering. If `board` is the pondered position and the ponder
+        search completed at least `min_depth`, return its move (list format)
+        and update the context as a normal search would; otherwise None.
+        """
+        self.stop()
+        if self.root is None:
+            return None
+        pos = Bitboard.Position.from_board(board, rebel_to_move)
+        hit = pos.hash == self.root
+        self.root = None
+        if not hit:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.result is None or self.result[0] < min_depth:
+            return None
+        best_move = self.result[1]
+        context.finish_search(self.searcher, pos, best_move)
+        return Bitboard.to_move_list(best_move)
@@ -0,0 +1,207 @@
+"""
+Proof-number search for forced officer captures.
+
+Alpha-beta at a fixed depth misses capture sequences that are longer than
+its horizon, but whether the officers can *force* captures is a yes / no
+question, and proof-number search answers those with far fewer nodes: it
+always expands the leaf that is cheapest to prove or disprove, so narrow
+forcing lines (captures are mandatory) are followed deep while wide
+quiet branches are left alone.
+
+The question asked is "can the officers capture `captures` rebels within
+`max_plies` plies, whatever the rebels do?". A line is
+
+* proved when the rebel count has dropped by `captures` (or below 9,
+  which wins the game),
+* disproved when the rebels win (fortress full or officers trapped) or
+  the ply limit is reached without the captures.
+
+Officer nodes are OR nodes, rebel nodes AND nodes. The tree is kept in
+memory and bounded by `max_nodes`; the search gives up (result None) when
+it is used up.
+"""
+
+import math
+
+import Bitboard
+
+INFINITY = math.inf
+
+# Defaults used by OfficerAI
+PROOF_CAPTURES = 2
+PROOF_MAX_PLIES = 10
+PROOF_NODES = 5000
+# Smaller budget for a capture on the board far from the end of the game
+PROOF_CAPTURE_NODES = 2000
+# With this many rebels or fewer, a capture threat is worth a proof attempt
+PROOF_ENDGAME_REBELS = 10
+
+
+class Node:
+    __slots__ = ('rebels', 'officers', 'rebel_to_move', 'ply', 'move', 'parent',
+                 'children', 'pn', 'dn')
+
+    def __init__(self, rebels, officers, rebel_to_move, ply, move, parent):
+        self.rebels = rebels
+        self.officers = officers
+        self.rebel_to_move = rebel_to_move
+        self.ply = ply
+        self.move = move
+        self.parent = parent
+        self.children = None
+        self.pn = 1
+        self.dn = 1
+
+
+class ProofSearch:
+
+    def __init__(self, captures=PROOF_CAPTURES, max_plies=PROOF_MAX_PLIES, max_nodes=PROOF_NODES):
+        self.captures = captures
+        self.max_plies = max_plies
+        self.max_nodes = max_nodes
+        self.nodes = 0
+
+    def solve(self, rebels, officers, rebel_to_move=False):
+        """
+        True (proved), False (disproved) or None (node budget used up).
+        After a proof, `proved_line()` gives the forcing line.
+        """
+        self.target = Bitboard.popcount(rebels) - self.captures
+        self.nodes = 1
+        self.root = Node(rebels, officers, rebel_to_move, 0, None, None)
+        self.evaluate(self.root)
+        root = self.root
+        while root.pn and root.dn:
+            if self.nodes >= self.max_nodes:
+                return None
+            node = self.most_proving(root)
+            self.expand(node)
+            self.update_ancestors(node)
+        return root.pn == 0
+
+    def evaluate(self, node):
+        """Set pn / dn of a new leaf: 0 / inf when proved, inf / 0 when disproved, 1 / 1 otherwise."""
+        rebels = node.rebels
+        count = Bitboard.popcount(rebels)
+        if count <= self.target or count < 9:
+            node.pn, node.dn = 0, INFINITY
+        elif (Bitboard.popcount(rebels & Bitboard.FORTRESS_MASK) == 9
+              or not Bitboard.officer_can_move(rebels, node.officers)
+              or node.ply >= self.max_plies):
+            node.pn, node.dn = INFINITY, 0
+
+    def most_proving(self, node):
+        while node.children is not None:
+            if node.rebel_to_move:
+                # AND node: the child that decides the disproof number
+                for child in node.children:
+                    if child.dn == node.dn:
+                        break
+            else:
+                for child in node.children:
+                    if child.pn == node.pn:
+                        break
+            node = child
+        return node
+
+    def expand(self, node):
+        rebels, officers = node.rebels, node.officers
+        if node.rebel_to_move:
+            moves = Bitboard.rebel_moves(rebels, officers)
+            if not moves:
+                moves = [None]  # rebels without a legal move pass
+        else:
+            moves = (Bitboard.officer_capture_chains(rebels, officers)
+                     or Bitboard.officer_moves(rebels, officers))
+        children = []
+        for move in moves:
+            if move is None:
+                child_rebels, child_officers = rebels, officers
+            else:
+                child_rebels, child_officers = Bitboard.apply(rebels, officers, move)
+            child = Node(child_rebels, child_officers, not node.rebel_to_move, node.ply + 1, move, node)
+            self.evaluate(child)
+            children.append(child)
+        self.nodes += len(children)
+        node.children = children
+        self.set_numbers(node)
+
+    def set_numbers(self, node):
+        children = node.children
+        if node.rebel_to_move:
+            node.pn = sum(child.pn for child in children)
+            node.dn = min(child.dn for child in children)
+        else:
+            node.pn = min(child.pn for child in children)
+            node.dn = sum(child.dn for child in children)
+
+    def update_ancestors(self, node):
+        node = node.parent
+        while node is not None:
+            pn, dn = node.pn, node.dn
+            self.set_numbers(node)
+            if node.pn == pn and node.dn == dn:
+                break
+            node = node.parent
+
+    def proved_line(self):
+        """Moves of a proved line from the root: the proving officer moves and the rebel replies that hold out longest."""
+        line = []
+        node = self.root
+        while node.children is not None and node.pn == 0:
+            if node.rebel_to_move:
+                # Any reply is refuted; follow the one with the largest subtree
+                node = max(node.children, key=subtree_size)
+            else:
+                node = next(child for child in node.children if child.pn == 0)
+            if node.move is None:
+                break
+            line.append(node.move)
+        return line
+
+
+def subtree_size(node):
+    if node.children is None:
+        return 1
+    return 1 + sum(subtree_size(child) for child in node.children)
+
+
+def capture_threat(rebels, officers):
+    """True if some officer step leaves the officers a capture."""
+    for move in Bitboard.officer_moves(rebels, officers):
+        if Bitboard.officer_captures(*Bitboard.apply(rebels, officers, move)):
+            return True
+    return False
+
+
+def proof_budget(pos, has_capture):
+    """
+    Node budget for forced_capture_line in `pos` (officers to move), or 0
+    when a proof is unlikely. Proofs almost only succeed with a capture on
+    the board, or with a capture threat near the end of the game. Quiet
+    middlegame positions are left to the minimax search.
+    """
+    endgame = Bitboard.popcount(pos.rebels) <= PROOF_ENDGAME_REBELS
+    if endgame and (has_capture or capture_threat(pos.rebels, pos.officers)):
+        return PROOF_NODES
+    if has_capture:
+        return PROOF_CAPTURE_NODES
+    return 0
+
+
+def forced_capture_line(pos, captures=PROOF_CAPTURES, max_plies=PROOF_MAX_PLIES, max_nodes=PROOF_NODES, stats=None):
+    """
+    The line of a forced `captures`-capture sequence (fewer if that already
+    wins the game) for the officers to move in `pos`, or None if it could
+    not be proved within the limits.
+    """
+    captures = min(captures, Bitboard.popcount(pos.rebels) - 8)
+    if captures <= 0:
+        return None
+    search = ProofSearch(captures, max_plies, max_nodes)
+    result = search.solve(pos.rebels, pos.officers, rebel_to_move=False)
+    if stats is not None:
+        stats.proof_nodes += search.nodes
+    if not result:
+        return None
+    return search.proved_line()
@@ -1,118 +1,153 @@
 import random
-import copy
 import math
 import time
 
+import Bitboard
+import OpeningBook
+import ParallelSearch
+import Tablebase
+from Search import Searcher, MAX_ITERATIVE_DEPTH
+from TimeManager import TimeManager
+
 # 配置选项
 MAX_DEPTH = 5
 TIME_LIMIT = 9.0
+USE_OPENING_BOOK = True # 先查开局库 (opening_book.bin)
+USE_TABLEBASE = True # 残局库 (endgame_tablebase.bin)：根节点直接走最优步，搜索中精确评分
+SELECTIVE_SEARCH = False # 选择性搜索：内部节点只走活跃叛军 (靠近警官或要塞入口)，根节点全宽验证
 
-def get_best_rebel_move(board, use_iterative=False):
+def get_best_rebel_move(board, use_iterative=False, tt=None, workers=1, context=None, depth=None, stats=None):
     """
     计算叛军最佳移动。
     根据 use_iterative 决定使用固定深度还是迭代加深。
+    搜索在位棋盘 (Bitboard) 上进行，返回值仍是 [[r, c], [r, c]] 格式。
+    tt: 可选的置换表 (TranspositionTable)，为 None 时每次搜索新建。
+    workers: 大于 1 时把根节点走法分给多个进程并行搜索 (ParallelSearch)。
+    context: 可选的 Search.SearchContext，跨回合保留置换表、历史表和主变例。
+    depth: 搜索深度 (固定深度模式，迭代加深时为最大深度)，默认 MAX_DEPTH / 不限。
+    stats: 可选的 Search.SearchStats，记录本次搜索的节点数、剪枝和各深度用时。
     """
     start_time = time.time()
+    if stats is not None:
+        # 统计从调用开始计时
+        stats.reset()
+    pos = Bitboard.Position.from_board(board, rebel_to_move=True)
     
     # 获取所有合法移动
-    moves = get_all_rebel_moves(board)
+    moves = Bitboard.rebel_moves(pos.rebels, pos.officers)
     if not moves:
         return []
     
     if len(moves) == 1:
-        return moves[0]
+        return Bitboard.to_move_list(moves[0])
         
+    # 开局库命中则直接走
+    if USE_OPENING_BOOK:
+        book_move = OpeningBook.probe(pos, True, moves)
+        if book_move is not None:
+            return Bitboard.to_move_list(book_move)
+    
+    # 残局库中有胜负结果则直接走
+    if USE_TABLEBASE:
+        table_move = Tablebase.best_move(pos, True, moves)
+        if table_move is not None:
+            return Bitboard.to_move_list(table_move)
+    
+    # 先打乱顺序，排序后同分的走法仍保持随机
     random.shuffle(moves)
     
-    best_move = moves[0]
+    ply_shift = 0
+    orderer = None
+    if context is not None:
+        tt = context.tt
+        orderer = context.orderer
+        ply_shift = context.start_search(pos)
     
+    # 迭代加深时才检查时间：TIME_LIMIT 为硬上限，TimeManager 按局面分配本步预算
+    searcher = Searcher('R', evaluate_position, tt,
+                        start_time if use_iterative else None, TIME_LIMIT, orderer)
+    searcher.stats = stats
+    searcher.selective = SELECTIVE_SEARCH
+    searcher.tablebase = Tablebase.get_tablebase() if USE_TABLEBASE else None
     if use_iterative:
+        searcher.time_manager = TimeManager(TIME_LIMIT, start_time)
+        searcher.time_manager.allocate(pos, len(moves))
+    moves = searcher.order_root(pos, moves, rebel_to_move=True, ply_shift=ply_shift)
+    
+    if workers > 1:
+        # 多进程根节点并行搜索
+        best_move = ParallelSearch.parallel_best_move(
+            pos, moves, True, 'R', evaluate_position,
+            None if use_iterative else (depth or MAX_DEPTH), start_time, TIME_LIMIT, workers,
+            searcher.time_manager.budget if use_iterative else None)
+        completed_depth = 0 if use_iterative else (depth or MAX_DEPTH)
+    elif use_iterative:
         # 迭代加深模式
-        current_depth = 1
-        max_possible_depth = 10
-        try:
-            while current_depth <= max_possible_depth:
-                alpha = -math.inf
-                beta = math.inf
-                current_best_move = None
-                current_best_score = -math.inf
-                
-                for move in moves:
-                    if time.time() - start_time > TIME_LIMIT:
-                        raise TimeoutError
-                    
-                    new_board = apply_move(board, move)
-                    score = minimax(new_board, current_depth - 1, False, alpha, beta, start_time)
-                    
-                    if score > current_best_score:
-                        current_best_score = score
-                        current_best_move = move
-                    
-                    alpha = max(alpha, score)
-                    if beta <= alpha:
-                        break
-                
-                best_move = current_best_move
-                current_depth += 1
-        except TimeoutError:
-            pass
+        best_move, _, completed_depth = searcher.iterative_deepening(pos, moves, depth or MAX_ITERATIVE_DEPTH)
     else:
         # 固定深度模式
-        best_score = -math.inf
-        alpha = -math.inf
-        beta = math.inf
-        
-        for move in moves:
-            new_board = apply_move(board, move)
-            # 传入 None 作为 start_time 表示不检查时间
-            score = minimax(new_board, MAX_DEPTH - 1, False, alpha, beta, None)
-            
-            if score > best_score:
-                best_score = score
-                best_move = move
-                
-            alpha = max(alpha, score)
-            if beta <= alpha:
-                break
-                
-    return best_move
-
-def minimax(board, depth, is_maximizing, alpha, beta, start_time):
-    # 如果启用了迭代加深，检查时间
-    if start_time and (time.time() - start_time > TIME_LIMIT):
-        raise TimeoutError
+        best_move, _, _ = searcher.search_root(pos, moves, depth or MAX_DEPTH, -math.inf, math.inf)
+        completed_depth = depth or MAX_DEPTH
+    
+    if stats is not None:
+        # 记录统计 (在提取主变例之前，以免计入其探查)
+        stats.finish(searcher, completed_depth)
+    if context is not None:
+        context.finish_search(searcher, pos, best_move)
+    return Bitboard.to_move_list(best_move)
 
-    winner = check_winner(board)
-    if winner == 'R': return 10000 + depth
-    if winner == 'O': return -10000 - depth
-    if depth == 0:
-        return evaluate_board(board)
-    
-    if is_maximizing:
-        max_eval = -math.inf
-        moves = get_all_rebel_moves(board)
-        if not moves: return -10000
-        
-        for move in moves:
-            new_board = apply_move(board, move)
-            eval = minimax(new_board, depth - 1, False, alpha, beta, start_time)
-            max_eval = max(max_eval, eval)
-            alpha = max(alpha, eval)
-            if beta <= alpha: break
-        return max_eval
-    else:
-        min_eval = math.inf
-        captures = get_all_officer_captures(board)
-        moves = captures if captures else get_all_officer_moves(board)
-        if not moves: return 10000
-        
-        for move in moves:
-            new_board = apply_move(board, move)
-            eval = minimax(new_board, depth - 1, True, alpha, beta, start_time)
-            min_eval = min(min_eval, eval)
-            beta = min(beta, eval)
-            if beta <= alpha: break
-        return min_eval
+def iterate_best_rebel_move(board, token=None, context=None, max_depth=MAX_ITERATIVE_DEPTH, time_limit=None):
+    """
+    随时可停的搜索 (anytime)：生成器，每完成一层迭代加深就产出
+    (depth, move, score)，move 为 [[r, c], [r, c]] 格式。
+    token: 可选的 Search.CancellationToken，可从任意线程 cancel()；搜索在当前层中途停止，
+    生成器正常结束 (不抛异常)，最后产出的结果仍然有效。调用方也可以在任意一次产出后停止迭代。
+    time_limit: 可选的时间上限 (秒)。
+    开局库、残局库或唯一走法时只产出一次 (0, move, None)。
+    """
+    start_time = time.time()
+    pos = Bitboard.Position.from_board(board, rebel_to_move=True)
+    moves = Bitboard.rebel_moves(pos.rebels, pos.officers)
+    if not moves:
+        return
+    if len(moves) == 1:
+        yield 0, Bitboard.to_move_list(moves[0]), None
+        return
+    if USE_OPENING_BOOK:
+        book_move = OpeningBook.probe(pos, True, moves)
+        if book_move is not None:
+            yield 0, Bitboard.to_move_list(book_move), None
+            return
+    if USE_TABLEBASE:
+        table_move = Tablebase.best_move(pos, True, moves)
+        if table_move is not None:
+            yield 0, Bitboard.to_move_list(table_move), None
+            return
+    
+    random.shuffle(moves)
+    tt = None
+    orderer = None
+    ply_shift = 0
+    if context is not None:
+        tt = context.tt
+        orderer = context.orderer
+        ply_shift = context.start_search(pos)
+    
+    searcher = Searcher('R', evaluate_position, tt,
+                        start_time if time_limit else None, time_limit, orderer)
+    searcher.stop_event = token
+    searcher.selective = SELECTIVE_SEARCH
+    searcher.tablebase = Tablebase.get_tablebase() if USE_TABLEBASE else None
+    moves = searcher.order_root(pos, moves, rebel_to_move=True, ply_shift=ply_shift)
+    best_move = None
+    try:
+        for depth, move, score in searcher.iterate(pos, moves, max_depth):
+            best_move = move
+            yield depth, Bitboard.to_move_list(move), score
+    finally:
+        # 调用方提前停止时也记录主变例
+        if context is not None and best_move is not None:
+            context.finish_search(searcher, pos, best_move)
 
 def evaluate_board(board):
     """
@@ -170,21 +205,33 @@ def evaluate_board(board):
     
     return score
 
+def evaluate_position(pos):
+    """
+    与 evaluate_board 完全相同的评分，使用 Position 增量维护的特征 (O(1))。
+    """
+    rebel_count = Bitboard.popcount(pos.rebels)
+    if rebel_count < 9: return -10000
+    # 每对相邻叛军双方各得 10 分
+    return (pos.rebel_pst + pos.pairs * 20
+            - Bitboard.popcount(pos.officers) * 100 - pos.mobility * 20
+            + rebel_count * 50)
+
 def apply_move(board, move):
     """在副本上执行移动"""
-    new_board = copy.deepcopy(board)
-    start, end = move[0], move[1]
+    new_board = [row[:] for row in board]
+    start, end = move[0], move[-1]
     
     # 移动棋子
     piece = new_board[start[0]][start[1]]
-    new_board[end[0]][end[1]] = piece
     new_board[start[0]][start[1]] = '.'
     
-    # 如果是吃子 (距离 > 1)
-    if abs(start[0] - end[0]) > 1 or abs(start[1] - end[1]) > 1:
-        mid_r = (start[0] + end[0]) // 2
-        mid_c = (start[1] + end[1]) // 2
-        new_board[mid_r][mid_c] = '.'
+    # 如果是吃子 (距离 > 1)；连吃时每一跳都吃掉中间的叛军
+    for frm, to in zip(move, move[1:]):
+        if abs(frm[0] - to[0]) > 1 or abs(frm[1] - to[1]) > 1:
+            mid_r = (frm[0] + to[0]) // 2
+            mid_c = (frm[1] + to[1]) // 2
+            new_board[mid_r][mid_c] = '.'
+    new_board[end[0]][end[1]] = piece
         
     return new_board
 
@@ -238,18 +285,33 @@ def get_all_officer_moves(board):
     return moves
 
 def get_all_officer_captures(board):
+    """警官的所有最大连吃序列 (规则同 Asalto.is_valid_move: 能吃就可以继续跳，被吃的叛军在整步结束后才移除)"""
     captures = []
     rows = len(board)
     cols = len(board[0])
+    directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
     for r in range(rows):
         for c in range(cols):
             if board[r][c] == 'O':
-                directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-                for dr, dc in directions:
-                    mr, mc = r + dr, c + dc
-                    nr, nc = r + 2*dr, c + 2*dc
-                    if 0 <= nr < rows and 0 <= nc < cols:
-                        if dr != 0 and dc != 0 and (r % 2) != (c % 2): continue
-                        if board[mr][mc] == 'R' and board[nr][nc] == '.':
-                            captures.append([[r, c], [nr, nc]])
+                seen = set()
+                stack = [([[r, c]], frozenset())]
+                while stack:
+                    path, captured = stack.pop()
+                    cr, cc = path[-1]
+                    # 同一格子、同一批被吃叛军的状态只展开一次
+                    if ((cr, cc), captured) in seen: continue
+                    seen.add(((cr, cc), captured))
+                    extended = False
+                    for dr, dc in directions:
+                        mr, mc = cr + dr, cc + dc
+                        nr, nc = cr + 2*dr, cc + 2*dc
+                        if 0 <= nr < rows and 0 <= nc < cols:
+                            if dr != 0 and dc != 0 and (cr % 2) != (cc % 2): continue
+                            if board[mr][mc] != 'R' or (mr, mc) in captured: continue
+                            # 起点和已被吃掉的格子可以落脚
+                            if board[nr][nc] == '.' or (nr, nc) == (r, c) or (nr, nc) in captured:
+                                stack.append((path + [[nr, nc]], captured | {(mr, mc)}))
+                                extended = True
+                    if not extended and len(path) > 1:
+                        captures.append(path)
     return captures
\ No newline at end of file
@@ -0,0 +1,712 @@
+"""
+Alpha-beta search shared by RebelAI and OfficerAI.
+
+Both modules used to carry their own copy of minimax; the only differences
+were which side is maximizing and which evaluation function is used. A
+Searcher is created for one side ('R' or 'O') with that side's evaluation
+function and searches a Bitboard.Position in place.
+"""
+
+import math
+import threading
+import time
+
+import Bitboard
+import Tablebase
+from MoveOrdering import MoveOrderer
+from Transposition import TranspositionTable, EXACT, LOWER, UPPER, WIN_THRESHOLD, score_to_tt, score_from_tt
+
+# Half-width of the first aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 60
+# Depth limit for iterative deepening (the clock normally stops it first)
+MAX_ITERATIVE_DEPTH = 20
+# The clock and stop_event are checked once every this many nodes
+NODES_PER_CHECK = 512
+# Quiescence nodes a Searcher may spend (over all its iterations) before the
+# horizon falls back to the plain evaluation; 0 switches quiescence off
+QUIESCENCE_NODES = 200000
+# Principal variation search: every move after the first is searched with a
+# null window and only re-searched with the full window if it beats it
+USE_PVS = True
+# Late move reductions: quiet moves from the LMR_MIN_MOVES-th on are searched
+# one ply shallower (two from LMR_LATE_MOVES on) at nodes with at least
+# LMR_MIN_DEPTH plies left, and re-searched at full depth if they look good
+USE_LMR = True
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_LATE_MOVES = 10
+# No reductions while the game may be decided soon: at most this many rebels
+# above the 9 the officers must capture down to, or this many missing from
+# a full fortress...
+LMR_WIN_MARGIN = 2
+# ...or while an officer has at most this many empty squares around it
+LMR_TRAP_FREEDOM = 2
+# Selective rebel move generation (Searcher.selective): below the root only
+# rebels within SELECTIVE_DISTANCE squares of an officer or of the fortress
+# entry move, plus the SELECTIVE_EXTRA_MOVES most advancing other moves
+SELECTIVE_DISTANCE = 1
+SELECTIVE_EXTRA_MOVES = 3
+# ...and the best VERIFY_MOVES root moves are verified by a full-width search
+VERIFY_MOVES = 2
+
+
+class Searcher:
+
+    def __init__(self, side, evaluate, tt=None, start_time=None, time_limit=None, orderer=None):
+        """
+        side: 'R' or 'O', the maximizing player
+        evaluate: function(pos) -> score from `side`'s point of view
+        tt: TranspositionTable to use (a fresh one is created if None)
+        start_time / time_limit: raise TimeoutError once exceeded (None disables the check)
+        orderer: MoveOrderer to use (a fresh one is created if None)
+
+        The deadline and `stop_event` (a threading.Event that stops the search
+        when set) are checked every NODES_PER_CHECK nodes; the search then
+        raises TimeoutError. Setting `time_manager` (a TimeManager) lets
+        iterative deepening stop before a depth that would not finish in the
+        move's budget. Setting `stats` (a SearchStats) counts nodes and
+        evaluations into it. At the horizon officer captures are resolved by
+        `quiesce` until `quiescence_nodes` is used up. `pvs` and `lmr` switch
+        principal variation search and late move reductions (defaults:
+        USE_PVS / USE_LMR). Setting `selective` restricts the rebel moves
+        below the root to the active rebels (see `selective_rebel_moves`);
+        the root moves are still all searched and verified (`verify_root`).
+        Setting `tablebase` (a Tablebase.Tablebase) scores the won and lost
+        positions it holds exactly, without searching them; drawn positions
+        are searched and evaluated as usual.
+        """
+        self.side = side
+        self.evaluate = evaluate
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.start_time = start_time
+        self.time_limit = time_limit
+        self.orderer = orderer if orderer is not None else MoveOrderer()
+        self.stop_event = None
+        self.time_manager = None
+        # Optional SearchStats; None keeps the counting out of the search
+        self.stats = None
+        self.check_countdown = NODES_PER_CHECK
+        self.quiescence_nodes = QUIESCENCE_NODES
+        self.pvs = USE_PVS
+        self.lmr = USE_LMR
+        self.selective = False
+        self.tablebase = None
+        self.verify_tt = None
+        self.near = Bitboard.within_distance(SELECTIVE_DISTANCE)
+        self.entry_zone = 0
+        for sq in Bitboard.iter_bits(Bitboard.FORTRESS_ENTRY_MASK):
+            self.entry_zone |= self.near[sq]
+
+    def generate_moves(self, pos, rebel_to_move):
+        if rebel_to_move:
+            return Bitboard.rebel_moves(pos.rebels, pos.officers)
+        # Mandatory capture rule; a capture chain is a single move
+        captures = Bitboard.officer_capture_chains(pos.rebels, pos.officers)
+        return captures if captures else Bitboard.officer_moves(pos.rebels, pos.officers)
+
+    def selective_rebel_moves(self, pos):
+        """
+        Rebel moves for an interior node in selective mode: every move of a
+        rebel within SELECTIVE_DISTANCE of an officer or of the fortress
+        entry, and of the others only the SELECTIVE_EXTRA_MOVES that gain
+        the most on the rebel piece-square table. Most of the rebels are far
+        from both and their moves rarely matter a few plies deep.
+        """
+        moves = Bitboard.rebel_moves(pos.rebels, pos.officers)
+        if len(moves) <= SELECTIVE_EXTRA_MOVES:
+            return moves
+        zone = self.entry_zone
+        for sq in Bitboard.iter_bits(pos.officers):
+            zone |= self.near[sq]
+        active = []
+        others = []
+        for move in moves:
+            if zone >> move[0] & 1:
+                active.append(move)
+            else:
+                others.append(move)
+        if len(others) > SELECTIVE_EXTRA_MOVES:
+            pst = Bitboard.REBEL_PST
+            others.sort(key=lambda m: pst[m[1]] - pst[m[0]], reverse=True)
+            if self.stats is not None:
+                self.stats.pruned += len(others) - SELECTIVE_EXTRA_MOVES
+            del others[SELECTIVE_EXTRA_MOVES:]
+        return active + others
+
+    def order_root(self, pos, moves, rebel_to_move, ply_shift=0):
+        """
+        Order root moves: previous best move from the table first, then the
+        usual stages. Every search starts here, so the per-move budgets are
+        reset as well (a Searcher may be kept across moves, see ParallelSearch).
+        """
+        self.check_countdown = NODES_PER_CHECK
+        self.quiescence_nodes = QUIESCENCE_NODES
+        self.tt.new_search()
+        self.tt.reset_stats()
+        self.orderer.new_search(ply_shift)
+        return self.orderer.order(pos, moves, 0, self.tt_move(pos), rebel_to_move)
+
+    def tt_move(self, pos):
+        """Best move stored for `pos` (in `pos`'s orientation), or None."""
+        key, mirrored = pos.canonical_key()
+        entry = self.tt.probe(key)
+        if entry is None or entry[4] is None:
+            return None
+        return Bitboard.mirror_move(entry[4]) if mirrored else entry[4]
+
+    def store_root(self, pos, depth, flag, score, move):
+        key, mirrored = pos.canonical_key()
+        if mirrored:
+            move = Bitboard.mirror_move(move)
+        self.tt.store(key, depth, flag, score_to_tt(score, depth), move,
+                      Bitboard.popcount(pos.rebels), pos.rows)
+
+    def search_root(self, pos, moves, depth, alpha, beta):
+        """
+        Search every root move to `depth` (the root side is maximizing).
+        Returns (best_move, best_score, scores) where scores maps each searched
+        move to its (fail-soft) score. The root result goes into the table too.
+        """
+        alpha_orig = alpha
+        best_move = None
+        best_score = -math.inf
+        scores = {}
+        for i, move in enumerate(moves):
+            undo = pos.make(move)
+            if i > 0 and self.pvs and alpha + 1 < beta:
+                score = self.minimax(pos, depth - 1, False, alpha, alpha + 1)
+                if alpha < score < beta:
+                    if self.stats is not None:
+                        self.stats.researches += 1
+                    score = self.minimax(pos, depth - 1, False, alpha, beta)
+            else:
+                score = self.minimax(pos, depth - 1, False, alpha, beta)
+            pos.unmake(undo)
+            scores[move] = score
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if beta <= alpha:
+                break
+        if self.selective and VERIFY_MOVES and depth >= 3 and best_score < beta:
+            best_move, best_score = self.verify_root(pos, scores, depth, alpha_orig, beta)
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.store_root(pos, depth, flag, best_score, best_move)
+        return best_move, best_score, scores
+
+    def verify_root(self, pos, scores, depth, alpha, beta):
+        """
+        Re-search the VERIFY_MOVES best root moves of a selective search
+        full-width and return the best of them as (move, score); `scores` is
+        updated. Selective search only drops rebel options, so it can
+        underrate a root move whose point is a far rebel move. The full-width
+        results go into a separate table, because the main table holds the
+        selective ones for the same positions.
+        """
+        candidates = sorted(scores, key=scores.get, reverse=True)[:VERIFY_MOVES]
+        if self.verify_tt is None:
+            self.verify_tt = TranspositionTable()
+        tt = self.tt
+        self.tt = self.verify_tt
+        self.selective = False
+        best_move = None
+        best_score = -math.inf
+        try:
+            for i, move in enumerate(candidates):
+                undo = pos.make(move)
+                if i > 0 and self.pvs and alpha + 1 < beta:
+                    # Only needs to show whether it beats the best verified move
+                    score = self.minimax(pos, depth - 1, False, alpha, alpha + 1)
+                    if alpha < score < beta:
+                        score = self.minimax(pos, depth - 1, False, alpha, beta)
+                else:
+                    score = self.minimax(pos, depth - 1, False, alpha, beta)
+                pos.unmake(undo)
+                scores[move] = score
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                alpha = max(alpha, score)
+                if beta <= alpha:
+                    break
+        finally:
+            self.tt = tt
+            self.selective = True
+        return best_move, best_score
+
+    def iterative_deepening(self, pos, moves, max_depth=MAX_ITERATIVE_DEPTH):
+        """
+        Search depth 1, 2, 3, ... until max_depth or the time runs out.
+        Returns (best_move, best_score, completed_depth) of the last completed
+        iteration; see `iterate`.
+        """
+        best_move, best_score, completed_depth = moves[0], None, 0
+        for completed_depth, best_move, best_score in self.iterate(pos, moves, max_depth):
+            pass
+        return best_move, best_score, completed_depth
+
+    def iterate(self, pos, moves, max_depth=MAX_ITERATIVE_DEPTH):
+        """
+        Anytime iterative deepening: a generator that yields
+        (depth, best_move, best_score) after every completed depth.
+
+        Each iteration reuses what the previous one learned: root moves are
+        re-sorted by their last scores (PV move first) and the search starts
+        with an aspiration window around the last score, widened and
+        re-searched on fail-low / fail-high. The generator simply ends at
+        max_depth, on a win or loss score, when the time manager expects the
+        next depth not to fit, or when the deadline passes or stop_event (for
+        example a CancellationToken) is set in the middle of a depth. That
+        unfinished depth is discarded and `pos` is restored, so no exception
+        reaches the caller. The caller may also stop iterating after any
+        result. Every completed iteration is kept in self.iterations as
+        (depth, move, score).
+        """
+        best_score = None
+        self.aspiration_researches = 0
+        self.iterations = []
+        iteration_times = []
+        root = pos.copy()
+        for depth in range(1, max_depth + 1):
+            iteration_start = time.time()
+            if best_score is None or abs(best_score) > WIN_THRESHOLD:
+                delta = math.inf
+            else:
+                delta = ASPIRATION_WINDOW
+            try:
+                while True:
+                    alpha = best_score - delta if delta != math.inf else -math.inf
+                    beta = best_score + delta if delta != math.inf else math.inf
+                    move, score, scores = self.search_root(pos, moves, depth, alpha, beta)
+                    if alpha < score < beta or delta == math.inf:
+                        break
+                    # Fail-low or fail-high: widen the window and search again
+                    self.aspiration_researches += 1
+                    delta = delta * 4 if delta < 4 * ASPIRATION_WINDOW else math.inf
+            except TimeoutError:
+                # The aborted iteration leaves moves made on `pos`
+                pos.assign(root)
+                return
+
+            best_score = score
+            self.iterations.append((depth, move, score))
+            iteration_times.append(time.time() - iteration_start)
+            if self.stats is not None:
+                self.stats.depth_completed(depth)
+
+            # PV move first, then the rest by their scores in this iteration
+            moves = sorted(moves, key=lambda m: scores.get(m, -math.inf), reverse=True)
+            yield depth, move, score
+
+            # A forced win or loss will not change with more depth
+            if abs(best_score) > WIN_THRESHOLD:
+                return
+            # Do not start a depth that is not expected to finish in time
+            if self.time_manager is not None and not self.time_manager.start_next_depth(iteration_times):
+                return
+
+    def principal_variation(self, pos, rebel_to_move, max_length=MAX_ITERATIVE_DEPTH):
+        """Follow the best moves stored in the transposition table from `pos`."""
+        pv = []
+        undo_stack = []
+        while len(pv) < max_length:
+            move = self.tt_move(pos)
+            if move is None:
+                break
+            # Guard against hash collisions
+            if move not in self.generate_moves(pos, rebel_to_move):
+                break
+            pv.append(move)
+            undo_stack.append(pos.make(move))
+            rebel_to_move = not rebel_to_move
+            if Bitboard.winner(pos.rebels) is not None:
+                break
+        while undo_stack:
+            pos.unmake(undo_stack.pop())
+        return pv
+
+    def check_stop(self):
+        """Raise TimeoutError if the deadline has passed or stop_event is set."""
+        self.check_countdown = NODES_PER_CHECK
+        if self.start_time and (time.time() - self.start_time > self.time_limit):
+            raise TimeoutError
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise TimeoutError
+
+    def minimax(self, pos, depth, is_maximizing, alpha, beta, ply=1):
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+        self.check_countdown -= 1
+        if self.check_countdown <= 0:
+            self.check_stop()
+
+        winner = Bitboard.winner(pos.rebels)
+        if winner is not None:
+            return 10000 + depth if winner == self.side else -10000 - depth
+        if self.tablebase is not None:
+            value = self.tablebase.probe(pos.rebels, pos.officers, is_maximizing == (self.side == 'R'))
+            # Only decisive values cut off: the evaluations are not centred
+            # on 0, so a draw is left to the search and its evaluation
+            if value is not None and value != Tablebase.DRAW:
+                if stats is not None:
+                    stats.tablebase_hits += 1
+                score = Tablebase.value_to_score(value, depth)
+                return score if is_maximizing else -score
+        if depth == 0:
+            return self.quiesce(pos, is_maximizing, alpha, beta)
+
+        # Transposition table lookup (a position and its mirror image share an entry)
+        tt = self.tt
+        if pos.mirror_hash < pos.hash:
+            key = pos.mirror_hash
+            mirrored = True
+        else:
+            key = pos.hash
+            mirrored = False
+        entry = tt.probe(key)
+        tt_move = None
+        if entry is not None and entry[4] is not None:
+            tt_move = Bitboard.mirror_move(entry[4]) if mirrored else entry[4]
+        if entry is not None and entry[1] >= depth:
+            score = score_from_tt(entry[3], depth)
+            flag = entry[2]
+            if flag == EXACT:
+                tt.cutoffs += 1
+                return score
+            if flag == LOWER:
+                alpha = max(alpha, score)
+            elif flag == UPPER:
+                beta = min(beta, score)
+            if beta <= alpha:
+                tt.cutoffs += 1
+                return score
+
+        alpha_orig = alpha
+        beta_orig = beta
+        rebel_to_move = is_maximizing == (self.side == 'R')
+        if rebel_to_move and self.selective:
+            moves = self.selective_rebel_moves(pos)
+        else:
+            moves = self.generate_moves(pos, rebel_to_move)
+        if not moves:
+            return -10000 if is_maximizing else 10000
+        orderer = self.orderer
+        moves = orderer.order(pos, moves, ply, tt_move, rebel_to_move)
+        # Officers either have only captures or only quiet moves (mandatory capture)
+        reduce = (self.lmr and depth >= LMR_MIN_DEPTH and len(moves) > LMR_MIN_MOVES
+                  and (rebel_to_move or not Bitboard.is_capture(moves[0]))
+                  and self.can_reduce(pos))
+        pvs = self.pvs
+
+        best_move = None
+        if is_maximizing:
+            best = -math.inf
+            for i, move in enumerate(moves):
+                undo = pos.make(move)
+                if i == 0 or not (pvs or reduce):
+                    eval = self.minimax(pos, depth - 1, False, alpha, beta, ply + 1)
+                else:
+                    # Null window (PVS) and / or reduced depth (LMR) first
+                    window = alpha + 1 if pvs and alpha + 1 < beta else beta
+                    reduction = 0
+                    if reduce and i >= LMR_MIN_MOVES:
+                        reduction = 2 if i >= LMR_LATE_MOVES and depth > LMR_MIN_DEPTH else 1
+                        if stats is not None:
+                            stats.reductions += 1
+                    eval = self.minimax(pos, depth - 1 - reduction, False, alpha, window, ply + 1)
+                    if reduction and eval > alpha:
+                        if stats is not None:
+                            stats.researches += 1
+                        eval = self.minimax(pos, depth - 1, False, alpha, window, ply + 1)
+                    if window < beta and alpha < eval < beta:
+                        if stats is not None:
+                            stats.researches += 1
+                        eval = self.minimax(pos, depth - 1, False, alpha, beta, ply + 1)
+                pos.unmake(undo)
+                if eval > best:
+                    best = eval
+                    best_move = move
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    orderer.record_cutoff(pos, move, ply, depth, rebel_to_move, i == 0)
+                    break
+        else:
+            best = math.inf
+            for i, move in enumerate(moves):
+                undo = pos.make(move)
+                if i == 0 or not (pvs or reduce):
+                    eval = self.minimax(pos, depth - 1, True, alpha, beta, ply + 1)
+                else:
+                    window = beta - 1 if pvs and beta - 1 > alpha else alpha
+                    reduction = 0
+                    if reduce and i >= LMR_MIN_MOVES:
+                        reduction = 2 if i >= LMR_LATE_MOVES and depth > LMR_MIN_DEPTH else 1
+                        if stats is not None:
+                            stats.reductions += 1
+                    eval = self.minimax(pos, depth - 1 - reduction, True, window, beta, ply + 1)
+                    if reduction and eval < beta:
+                        if stats is not None:
+                            stats.researches += 1
+                        eval = self.minimax(pos, depth - 1, True, window, beta, ply + 1)
+                    if window > alpha and alpha < eval < beta:
+                        if stats is not None:
+                            stats.researches += 1
+                        eval = self.minimax(pos, depth - 1, True, alpha, beta, ply + 1)
+                pos.unmake(undo)
+                if eval < best:
+                    best = eval
+                    best_move = move
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    orderer.record_cutoff(pos, move, ply, depth, rebel_to_move, i == 0)
+                    break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if mirrored:
+            best_move = Bitboard.mirror_move(best_move)
+        tt.store(key, depth, flag, score_to_tt(best, depth), best_move,
+                 Bitboard.popcount(pos.rebels), pos.rows)
+        return best
+
+    def can_reduce(self, pos):
+        """
+        False where a late move may decide the game, so LMR must not skip
+        it: close to either win condition, or with an officer nearly trapped.
+        """
+        rebels = pos.rebels
+        if Bitboard.popcount(rebels) <= 9 + LMR_WIN_MARGIN:
+            return False
+        if Bitboard.popcount(rebels & Bitboard.FORTRESS_MASK) >= 9 - LMR_WIN_MARGIN:
+            return False
+        return Bitboard.officer_freedom(rebels, pos.officers) > LMR_TRAP_FREEDOM
+
+    def quiesce(self, pos, is_maximizing, alpha, beta):
+        """
+        Score a horizon node without stopping in the middle of a capture.
+
+        Only officers capture, and they must capture when they can, so an
+        officer-to-move node with a capture has no quiet alternative: every
+        capture is searched and the position is not scored as it stands.
+        Nodes without a capture (all rebel-to-move nodes, since rebels have
+        no captures) stand pat on the evaluation. Results are not stored in
+        the transposition table. Once `quiescence_nodes` is used up the
+        horizon is scored with the evaluation alone.
+        """
+        stats = self.stats
+        rebel_to_move = is_maximizing == (self.side == 'R')
+        captures = None
+        if not rebel_to_move and self.quiescence_nodes > 0:
+            captures = Bitboard.officer_capture_chains(pos.rebels, pos.officers)
+        if not captures:
+            if stats is not None:
+                stats.evaluations += 1
+            return self.evaluate(pos)
+
+        best = -math.inf if is_maximizing else math.inf
+        for move in captures:
+            self.quiescence_nodes -= 1
+            if stats is not None:
+                stats.quiescence_nodes += 1
+            self.check_countdown -= 1
+            if self.check_countdown <= 0:
+                self.check_stop()
+            undo = pos.make(move)
+            winner = Bitboard.winner(pos.rebels)
+            if winner is not None:
+                score = 10000 if winner == self.side else -10000
+            else:
+                score = self.quiesce(pos, not is_maximizing, alpha, beta)
+            pos.unmake(undo)
+            if is_maximizing:
+                if score > best:
+                    best = score
+                alpha = max(alpha, score)
+            else:
+                if score < best:
+                    best = score
+                beta = min(beta, score)
+            if beta <= alpha:
+                break
+        return best
+
+
+class CancellationToken(threading.Event):
+    """
+    Cancels a running search from any thread: pass it to the anytime search
+    functions (or set it as Searcher.stop_event) and call cancel(). The
+    search stops within NODES_PER_CHECK nodes and keeps the result of the
+    last completed depth.
+    """
+
+    def cancel(self):
+        self.set()
+
+    def cancelled(self):
+        return self.is_set()
+
+
+class SearchStats:
+    """
+    Opt-in instrumentation for one search. Give it to get_best_rebel_move /
+    get_best_officer_move (or set Searcher.stats) and it is filled with:
+
+    - nodes and leaf evaluations (counted in minimax), and the quiescence
+      nodes spent on officer captures past the horizon
+    - late move reductions, and re-searches after a reduced or null-window
+      search beat the window
+    - rebel moves left out by selective move generation
+    - won and lost positions scored by the endgame tablebase
+    - nodes of the proof-number search for forced captures (OfficerAI)
+    - beta cutoffs and how many came from the first move tried
+    - transposition table probes, hits and cutoffs
+    - the time at which every iterative deepening depth completed
+
+    Without a SearchStats the search only pays one `is not None` test per
+    node. Nodes searched in ParallelSearch worker processes are not counted.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        self.depth = 0
+        self.depth_times = []  # (depth, seconds from the start) per completed depth
+        self.nodes = 0
+        self.evaluations = 0
+        self.quiescence_nodes = 0
+        self.reductions = 0
+        self.researches = 0
+        self.pruned = 0
+        self.tablebase_hits = 0
+        self.proof_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+
+    def depth_completed(self, depth):
+        self.depth_times.append((depth, time.time() - self.start_time))
+
+    def finish(self, searcher, depth):
+        """Collect the table / ordering counters of `searcher` once its search is over."""
+        self.elapsed = time.time() - self.start_time
+        self.depth = depth
+        ordering = searcher.orderer.stats()
+        self.cutoffs = ordering['cutoff_nodes']
+        self.first_move_cutoffs = ordering['first_move_cutoffs']
+        tt = searcher.tt.stats()
+        self.tt_probes = tt['probes']
+        self.tt_hits = tt['hits']
+        self.tt_cutoffs = tt['cutoffs']
+
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def as_dict(self):
+        return {
+            'depth': self.depth,
+            'time': round(self.elapsed, 4),
+            'depth_times': [(d, round(t, 4)) for d, t in self.depth_times],
+            'nodes': self.nodes,
+            'evaluations': self.evaluations,
+            'quiescence_nodes': self.quiescence_nodes,
+            'reductions': self.reductions,
+            'researches': self.researches,
+            'pruned': self.pruned,
+            'tablebase_hits': self.tablebase_hits,
+            'proof_nodes': self.proof_nodes,
+            'nps': round(self.nps()),
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate(), 4),
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_cutoffs': self.tt_cutoffs,
+        }
+
+    def summary(self):
+        if self.nodes == 0 and self.depth == 0:
+            if self.proof_nodes:
+                return "proved forced captures, %d proof-number nodes" % self.proof_nodes
+            return "no search (book move or only one legal move)"
+        text = "depth %d, %d nodes (%d evals, %d quiescence) in %.3fs, %.0f nps, cutoffs %d (%.0f%% first), TT hits %d/%d" % (
+            self.depth, self.nodes, self.evaluations, self.quiescence_nodes, self.elapsed, self.nps(), self.cutoffs,
+            100 * self.first_move_cutoff_rate(), self.tt_hits, self.tt_probes)
+        if self.reductions or self.researches:
+            text += ", %d reductions, %d re-searches" % (self.reductions, self.researches)
+        if self.pruned:
+            text += ", %d rebel moves pruned" % self.pruned
+        if self.tablebase_hits:
+            text += ", %d tablebase hits" % self.tablebase_hits
+        if self.proof_nodes:
+            text += ", %d proof-number nodes" % self.proof_nodes
+        if self.depth_times:
+            text += ", depths " + " ".join("%d:%.2fs" % item for item in self.depth_times)
+        return text
+
+
+class SearchContext:
+    """
+    Search state that outlives a single move, owned by Team20.Player (one
+    per side): the transposition table, the move ordering tables and the
+    last principal variation.
+
+    When the opponent answers with the reply we predicted, the new root is
+    two plies down the old PV, so the table already holds its subtree and
+    the killers are shifted up by two plies instead of being cleared.
+    Entries for positions that can no longer be reached are marked as such
+    before every search (see TranspositionTable.set_reachable).
+    """
+
+    def __init__(self, tt_size=None):
+        self.tt = TranspositionTable(tt_size) if tt_size else TranspositionTable()
+        self.orderer = MoveOrderer()
+        self.last_pv = []
+        self.expected_root = None
+        self.pv_hits = 0
+
+    def start_search(self, pos):
+        """Prepare the tables for a search from `pos`; returns the killer ply shift to use."""
+        self.tt.set_reachable(Bitboard.popcount(pos.rebels), pos.rows)
+        if self.expected_root is not None and pos.hash == self.expected_root:
+            self.pv_hits += 1
+            return 2
+        return 0
+
+    def finish_search(self, searcher, pos, best_move):
+        """Remember the PV, and where the game should be after our move and the predicted reply."""
+        # The root entry may come from an unfinished iteration, so start from the move actually played
+        undo = pos.make(best_move)
+        self.last_pv = [best_move] + searcher.principal_variation(pos, searcher.side != 'R')
+        pos.unmake(undo)
+        self.expected_root = None
+        if len(self.last_pv) >= 2:
+            undo1 = pos.make(self.last_pv[0])
+            undo2 = pos.make(self.last_pv[1])
+            self.expected_root = pos.hash
+            pos.unmake(undo2)
+            pos.unmake(undo1)
+
+    def predicted_reply(self):
+        """Opponent reply expected after our last move, or None."""
+        return self.last_pv[1] if len(self.last_pv) >= 2 else None
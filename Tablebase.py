@@ -0,0 +1,445 @@
+"""
+Endgame tablebase for positions with few rebels left outside the fortress.
+
+Rebels never leave the fortress and captured rebels never come back, so the
+positions with at most K rebels outside the fortress (and at least 9 rebels
+in total, with the fortress not yet full) can only lead to each other or to
+the end of the game. The class is small enough to be solved exactly by
+retrograde analysis:
+
+    python3 Tablebase.py --outside 1
+
+1. every position of the class is enumerated; positions with a move that
+   ends the game in the mover's favour are won in 1, positions where all
+   moves end the game in the opponent's favour are lost in 1, and trapped
+   officers have lost (in 0) before moving;
+2. working backwards from the positions decided at distance d, every
+   predecessor (un-moves, un-captures) is decided at distance d + 1: it is
+   won if it can move into a lost position, and lost once all of its moves
+   lead into won positions.
+
+Positions never decided this way are draws: neither side can force a win.
+The rules are the referee's (Asalto.check_win): the officers win below 9
+rebels, the rebels win with 9 rebels in the fortress or as soon as the
+officers cannot move, and rebels without a legal move pass. Captures are
+mandatory and a capture is a whole chain of jumps
+(Bitboard.officer_capture_chains); both officers are assumed to be on the
+board.
+
+File format: an 8 byte header b'ASTB' + uint8 K + 3 pad bytes, then one byte
+per position, at the index computed by `index`:
+
+    0        draw
+    1..127   the side to move wins in that many plies
+    128..255 the side to move loses in (value - 128) plies
+
+The table is memory-mapped on the first probe, like the opening book.
+"""
+
+import mmap
+import os
+import struct
+import time
+from array import array
+from itertools import combinations
+
+import Bitboard
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame_tablebase.bin')
+
+MAGIC = b'ASTB'
+HEADER = struct.Struct('<4sBxxx')
+
+DRAW = 0
+LOSS = 128
+MAX_DISTANCE = 127
+
+FORTRESS_SQUARES = list(Bitboard.iter_bits(Bitboard.FORTRESS_MASK))
+OUTSIDE_MASK = Bitboard.FULL_MASK & ~Bitboard.FORTRESS_MASK
+OUTSIDE_SQUARES = list(Bitboard.iter_bits(OUTSIDE_MASK))
+# Position of every square within FORTRESS_SQUARES / OUTSIDE_SQUARES
+SUBSET_POSITION = [0] * Bitboard.NUM_SQUARES
+for _i, _sq in enumerate(FORTRESS_SQUARES):
+    SUBSET_POSITION[_sq] = _i
+for _i, _sq in enumerate(OUTSIDE_SQUARES):
+    SUBSET_POSITION[_sq] = _i
+
+# Squares a rebel can step to `i` from
+REBEL_FROM = [0] * Bitboard.NUM_SQUARES
+for _frm in range(Bitboard.NUM_SQUARES):
+    for _to in Bitboard.iter_bits(Bitboard.REBEL_STEPS[_frm]):
+        REBEL_FROM[_to] |= 1 << _frm
+
+_table = None
+_table_loaded = False
+
+
+def binomial(n, k):
+    if k < 0 or k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+def subset_rank(mask):
+    """Colex rank of the squares of `mask` (all fortress or all outside squares)."""
+    rank = 0
+    i = 1
+    for sq in Bitboard.iter_bits(mask):
+        rank += binomial(SUBSET_POSITION[sq], i)
+        i += 1
+    return rank
+
+
+class Layout:
+    """
+    Index layout for tables of positions with at most `max_outside` rebels
+    outside the fortress: one group per (fortress rebels, outside rebels)
+    count, each group indexed by the rank of the fortress rebels, the rank
+    of the outside rebels, the rank of the officer pair among the squares
+    without a rebel, and the side to move.
+    """
+
+    def __init__(self, max_outside):
+        self.max_outside = max_outside
+        # (in fortress, outside) -> (offset, outside combinations, officer pairs, size)
+        self.groups = {}
+        self.size = 0
+        for outside in range(max_outside + 1):
+            for in_fortress in range(max(0, 9 - outside), 9):
+                outside_count = binomial(len(OUTSIDE_SQUARES), outside)
+                pairs = binomial(Bitboard.NUM_SQUARES - in_fortress - outside, 2)
+                size = binomial(len(FORTRESS_SQUARES), in_fortress) * outside_count * pairs * 2
+                self.groups[(in_fortress, outside)] = (self.size, outside_count, pairs, size)
+                self.size += size
+
+    def index(self, rebels, officers, rebel_to_move):
+        """Index of the position, or None if it is not in the table."""
+        fortress = rebels & Bitboard.FORTRESS_MASK
+        outside = rebels & OUTSIDE_MASK
+        group = self.groups.get((Bitboard.popcount(fortress), Bitboard.popcount(outside)))
+        if group is None or Bitboard.popcount(officers) != 2:
+            return None
+        offset, outside_count, pairs, _ = group
+        free = Bitboard.FULL_MASK & ~rebels
+        low = officers & -officers
+        a = Bitboard.popcount(free & (low - 1))
+        b = Bitboard.popcount(free & ((officers ^ low) - 1))
+        pair_rank = a + b * (b - 1) // 2
+        index = (subset_rank(fortress) * outside_count + subset_rank(outside)) * pairs + pair_rank
+        return offset + index * 2 + (0 if rebel_to_move else 1)
+
+    def positions(self):
+        """Every (rebels, officers) of the table."""
+        for (in_fortress, outside) in self.groups:
+            for fortress_squares in combinations(FORTRESS_SQUARES, in_fortress):
+                fortress = 0
+                for sq in fortress_squares:
+                    fortress |= 1 << sq
+                for outside_squares in combinations(OUTSIDE_SQUARES, outside):
+                    rebels = fortress
+                    for sq in outside_squares:
+                        rebels |= 1 << sq
+                    free = list(Bitboard.iter_bits(Bitboard.FULL_MASK & ~rebels))
+                    for a, b in combinations(free, 2):
+                        yield rebels, (1 << a) | (1 << b)
+
+
+class Tablebase:
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, max_outside = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an Asalto tablebase: " + path)
+        self.layout = Layout(max_outside)
+        if len(self.data) != HEADER.size + self.layout.size:
+            raise ValueError("Tablebase has the wrong size: " + path)
+
+    def probe(self, rebels, officers, rebel_to_move):
+        """Stored value (see the module docstring) or None if the position is not in the table."""
+        if Bitboard.popcount(rebels & OUTSIDE_MASK) > self.layout.max_outside:
+            return None
+        index = self.layout.index(rebels, officers, rebel_to_move)
+        if index is None:
+            return None
+        return self.data[HEADER.size + index]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def get_tablebase(path=TABLE_PATH):
+    """Open the table on first use; returns None if there is no table file."""
+    global _table, _table_loaded
+    if not _table_loaded:
+        _table_loaded = True
+        if os.path.exists(path):
+            try:
+                _table = Tablebase(path)
+            except (OSError, ValueError) as err:
+                print("Tablebase: could not open " + path + ": " + str(err))
+                _table = None
+    return _table
+
+
+def value_to_score(value, depth):
+    """
+    Search score of a stored win or loss for the side to move, at a node
+    with `depth` plies left: a win in d plies scores like a win found d plies
+    below the node (10000 + depth - d), so shorter wins score higher. Draws
+    have no fixed score (neither evaluation is centred on 0); the search
+    evaluates them instead.
+    """
+    if value < LOSS:
+        return 10000 + depth - value
+    return -10000 - depth + (value - LOSS)
+
+
+def best_move(pos, rebel_to_move, legal_moves):
+    """
+    The move with the best outcome for the side to move (shortest win, or
+    longest loss), or None if the position is not in the table or the best
+    outcome is a draw (the search then picks among the drawing moves).
+    """
+    table = get_tablebase()
+    if table is None or table.probe(pos.rebels, pos.officers, rebel_to_move) is None:
+        return None
+    mover = 'R' if rebel_to_move else 'O'
+    best = None
+    best_key = None
+    for move in legal_moves:
+        rebels, officers = Bitboard.apply(pos.rebels, pos.officers, move)
+        winner = game_winner(rebels, officers)
+        if winner is not None:
+            key = (2, -1) if winner == mover else (0, 0)
+        else:
+            value = table.probe(rebels, officers, not rebel_to_move)
+            if value is None:
+                return None
+            if value == DRAW:
+                key = (1, 0)
+            elif value < LOSS:
+                key = (0, value)  # the opponent wins: make it take long
+            else:
+                key = (2, -(value - LOSS) - 1)
+        if best_key is None or key > best_key:
+            best_key = key
+            best = move
+    if best_key[0] == 1:
+        return None
+    return best
+
+
+# =================================================
+# Offline generator
+
+def generate_moves(rebels, officers, rebel_to_move):
+    if rebel_to_move:
+        return Bitboard.rebel_moves(rebels, officers)
+    captures = Bitboard.officer_capture_chains(rebels, officers)
+    return captures if captures else Bitboard.officer_moves(rebels, officers)
+
+
+def game_winner(rebels, officers):
+    """Asalto.check_win on bitboards: 'R', 'O' or None."""
+    winner = Bitboard.winner(rebels)
+    if winner is None and not Bitboard.officer_can_move(rebels, officers):
+        return 'R'
+    return winner
+
+
+def predecessors(layout, rebels, officers, rebel_to_move):
+    """Indices of the positions in the table with a legal move to this one."""
+    empty = Bitboard.FULL_MASK & ~(rebels | officers)
+    if not rebel_to_move:
+        # The rebels passed (no legal move)...
+        if not Bitboard.rebel_moves(rebels, officers):
+            index = layout.index(rebels, officers, True)
+            if index is not None:
+                yield index
+        # ...or a rebel just moved
+        for to in Bitboard.iter_bits(rebels):
+            for frm in Bitboard.iter_bits(REBEL_FROM[to] & empty):
+                index = layout.index(rebels ^ (1 << to) ^ (1 << frm), officers, True)
+                if index is not None:
+                    yield index
+        return
+    # An officer just moved or captured
+    for to in Bitboard.iter_bits(officers):
+        for frm in Bitboard.iter_bits(Bitboard.OFFICER_STEPS[to] & empty):
+            before = officers ^ (1 << to) ^ (1 << frm)
+            # A step is only legal without a capture available
+            if Bitboard.officer_captures(rebels, before):
+                continue
+            index = layout.index(rebels, before, False)
+            if index is not None:
+                yield index
+        for before in capture_predecessors(layout, rebels, officers, to):
+            index = layout.index(before[0], before[1], False)
+            if index is not None:
+                yield index
+
+
+def capture_predecessors(layout, rebels, officers, to):
+    """
+    (rebels, officers) before a capture chain that ended on `to`. The chain
+    is walked backwards one jump at a time, putting a rebel back on every
+    jumped square; its squares are all empty after the move (or `to` itself,
+    for a chain that ends where it started or on a captured rebel's square).
+    Walking back finds a superset of the real predecessors, so each one is
+    checked against the chains the forward generator plays from it.
+    """
+    other = officers ^ (1 << to)
+    allowed = (Bitboard.FULL_MASK & ~(rebels | officers)) | (1 << to)
+    found = set()
+    seen = set()
+    stack = [(to, 0)]
+    while stack:
+        at, restored = stack.pop()
+        for over_bit, frm_bit, frm in Bitboard.JUMPS[at]:
+            if not (allowed & over_bit and allowed & frm_bit) or restored & over_bit:
+                continue
+            before = rebels | restored | over_bit
+            # Positions with more rebels back are outside the table as well
+            if (Bitboard.popcount(before & OUTSIDE_MASK) > layout.max_outside
+                    or Bitboard.popcount(before & Bitboard.FORTRESS_MASK) >= 9):
+                continue
+            if (frm, restored | over_bit) in seen:
+                continue
+            seen.add((frm, restored | over_bit))
+            stack.append((frm, restored | over_bit))
+            if before & frm_bit:
+                continue  # the officer cannot have started on a rebel
+            found.add((before, other | frm_bit))
+    for before_rebels, before_officers in found:
+        for move in Bitboard.officer_capture_chains(before_rebels, before_officers):
+            if Bitboard.apply(before_rebels, before_officers, move) == (rebels, officers):
+                yield before_rebels, before_officers
+                break
+
+
+def unrank_position(layout, index):
+    """Inverse of Layout.index: (rebels, officers, rebel_to_move)."""
+    for (in_fortress, outside), (offset, outside_count, pairs, size) in layout.groups.items():
+        if offset <= index < offset + size:
+            break
+    local = index - offset
+    rebel_to_move = local % 2 == 0
+    local //= 2
+    pair_rank = local % pairs
+    local //= pairs
+    rebels = (unrank_subset(local // outside_count, in_fortress, FORTRESS_SQUARES)
+              | unrank_subset(local % outside_count, outside, OUTSIDE_SQUARES))
+    free = list(Bitboard.iter_bits(Bitboard.FULL_MASK & ~rebels))
+    b = 1
+    while binomial(b + 1, 2) <= pair_rank:
+        b += 1
+    a = pair_rank - binomial(b, 2)
+    return rebels, (1 << free[a]) | (1 << free[b]), rebel_to_move
+
+
+def unrank_subset(rank, k, squares):
+    mask = 0
+    for i in range(k, 0, -1):
+        p = i - 1
+        while binomial(p + 1, i) <= rank:
+            p += 1
+        rank -= binomial(p, i)
+        mask |= 1 << squares[p]
+    return mask
+
+
+def build_table(path=TABLE_PATH, max_outside=1, verbose=True):
+    start = time.time()
+    layout = Layout(max_outside)
+    values = bytearray(layout.size)
+    counts = bytearray(layout.size)
+    layers = [array('I'), array('I')]
+
+    # Positions decided without looking further; the others count the moves
+    # that do not end the game
+    for rebels, officers in layout.positions():
+        trapped = not Bitboard.officer_can_move(rebels, officers)
+        for rebel_to_move in (True, False):
+            index = layout.index(rebels, officers, rebel_to_move)
+            if trapped:
+                if rebel_to_move:
+                    # The game ended with the officers' last move
+                    values[index] = 1
+                else:
+                    values[index] = LOSS
+                    layers[0].append(index)
+                continue
+            moves = generate_moves(rebels, officers, rebel_to_move)
+            if not moves:
+                counts[index] = 1  # rebels pass
+                continue
+            mover = 'R' if rebel_to_move else 'O'
+            count = 0
+            for move in moves:
+                winner = game_winner(*Bitboard.apply(rebels, officers, move))
+                if winner == mover:
+                    values[index] = 1
+                    layers[1].append(index)
+                    break
+                if winner is None:
+                    count += 1
+            else:
+                if count:
+                    counts[index] = count
+                else:
+                    values[index] = LOSS + 1
+                    layers[1].append(index)
+    if verbose:
+        print("%d positions, %d lost / %d won at once (%.1fs)"
+              % (layout.size, len(layers[0]), len(layers[1]), time.time() - start))
+
+    # Retrograde analysis, one distance at a time
+    distance = 0
+    while distance < len(layers):
+        if layers[distance] and distance >= MAX_DISTANCE:
+            raise ValueError("Distance %d does not fit in the table format" % (distance + 1))
+        if len(layers) == distance + 1:
+            layers.append(array('I'))
+        found = layers[distance + 1]
+        for index in layers[distance]:
+            lost = values[index] >= LOSS
+            for before in predecessors(layout, *unrank_position(layout, index)):
+                if values[before]:
+                    continue
+                if lost:
+                    values[before] = distance + 1
+                    found.append(before)
+                else:
+                    counts[before] -= 1
+                    if counts[before] == 0:
+                        values[before] = LOSS + distance + 1
+                        found.append(before)
+        if verbose and layers[distance]:
+            print("distance %d: %d positions (%.1fs)" % (distance, len(layers[distance]), time.time() - start))
+        distance += 1
+        if not layers[-1]:
+            break
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, max_outside))
+        f.write(values)
+    if verbose:
+        draws = values.count(DRAW)
+        print("Wrote %d positions (%d draws) to %s in %.1fs" % (layout.size, draws, path, time.time() - start))
+    return layout.size
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the Asalto endgame tablebase")
+    parser.add_argument('--outside', type=int, default=1, help="maximum number of rebels outside the fortress")
+    parser.add_argument('--output', default=TABLE_PATH)
+    args = parser.parse_args()
+    build_table(args.output, args.outside)
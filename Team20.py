@@ -1,24 +1,76 @@
 # Asalto manual play example
 # JC4004 Computational Intelligence 2025-26
 
+import RebelAI
+import OfficerAI
 from RebelAI import get_best_rebel_move
 from OfficerAI import get_best_officer_move
+from Search import SearchContext, SearchStats, MAX_ITERATIVE_DEPTH
+from Ponder import Ponderer
 
 # Global configuration
 USE_ITERATIVE_DEEPENING = False
+SEARCH_WORKERS = 1 # Set > 1 to split the root moves over that many processes
+PONDER = False # Set to True to keep searching on the opponent's time
+COLLECT_STATS = False # Set to True to keep the SearchStats of every move in Player.last_stats
 
 class Player:
     def __init__(self):
-        # Initialization (load models here if needed)
-        pass
+        # Search state kept for the whole game (one per side, since a
+        # Player may be asked to play either role)
+        self.rebel_context = SearchContext()
+        self.officer_context = SearchContext()
+        self.ponderer = Ponderer()
+        # SearchStats of the last move (None if not collected or no search was run)
+        self.last_stats = None
 
     def play_rebel(self, board):
-        # Call RebelAI logic, pass configuration
-        return get_best_rebel_move(board, use_iterative=USE_ITERATIVE_DEEPENING)
+        # Use the ponder result if the opponent played the predicted reply
+        move = self.ponder_result(self.rebel_context, board, True, RebelAI.MAX_DEPTH)
+        self.last_stats = None
+        if move is None:
+            # Call RebelAI logic, pass configuration
+            self.last_stats = SearchStats() if COLLECT_STATS else None
+            move = get_best_rebel_move(board, use_iterative=USE_ITERATIVE_DEEPENING,
+                                       workers=SEARCH_WORKERS, context=self.rebel_context,
+                                       stats=self.last_stats)
+        self.start_pondering(self.rebel_context, 'R', RebelAI.evaluate_position, board, move,
+                             RebelAI.MAX_DEPTH)
+        return move
 
     def play_officer(self, board):
-        # Call OfficerAI logic, pass configuration
-        return get_best_officer_move(board, use_iterative=USE_ITERATIVE_DEEPENING)
+        # Use the ponder result if the opponent played the predicted reply
+        move = self.ponder_result(self.officer_context, board, False, OfficerAI.MAX_DEPTH)
+        self.last_stats = None
+        if move is None:
+            # Call OfficerAI logic, pass configuration
+            self.last_stats = SearchStats() if COLLECT_STATS else None
+            move = get_best_officer_move(board, use_iterative=USE_ITERATIVE_DEEPENING,
+                                         workers=SEARCH_WORKERS, context=self.officer_context,
+                                         stats=self.last_stats)
+        self.start_pondering(self.officer_context, 'O', OfficerAI.evaluate_position, board, move,
+                             OfficerAI.MAX_DEPTH)
+        return move
+
+    def close(self):
+        # Called when the game ends: stop the ponder thread
+        self.ponderer.close()
+
+    def ponder_result(self, context, board, is_rebel, max_depth):
+        if not PONDER:
+            return None
+        move = self.ponderer.take_result(context, board, is_rebel, max_depth)
+        # With iterative deepening a hit only warms up the table; search anyway
+        if USE_ITERATIVE_DEEPENING:
+            return None
+        return move
+
+    def start_pondering(self, context, side, evaluate, board, move, max_depth):
+        if not PONDER:
+            return
+        if USE_ITERATIVE_DEEPENING:
+            max_depth = MAX_ITERATIVE_DEPTH
+        self.ponderer.start(context, side, evaluate, board, move, max_depth)
 
     # =================================================
     # Print the board
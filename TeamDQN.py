@@ -9,8 +9,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'training_minimax_guided
 from model import AsaltoNet
 from RebelAI import get_all_rebel_moves, apply_move as apply_rebel_move
 from OfficerAI import get_all_officer_moves, get_all_officer_captures, apply_move as apply_officer_move
+import Bitboard
 
 DEVICE = torch.device("cpu") # 推理通常用 CPU 就够了
+VALUE_CACHE_SIZE = 200000 # 局面估值缓存上限 (超出后清空)
 
 class Player:
     def __init__(self):
@@ -24,6 +26,8 @@ class Player:
             print(f"TeamDQN: Warning! Model not found at {model_path}. Using random weights.")
             
         self.net.eval()
+        # 局面估值缓存：以左右镜像规范化后的 Zobrist 键为索引，镜像局面共用一项
+        self.value_cache = {}
 
     def play_rebel(self, board):
         return self.select_move(board, is_rebel=True)
@@ -43,18 +47,34 @@ class Player:
         if not moves:
             return []
 
-        # 转换为 Tensor
+        # 先查缓存，只对未缓存的局面调用网络
+        values = [None] * len(moves)
+        pending = []
         next_states = []
-        for move in moves:
+        for i, move in enumerate(moves):
             next_board = apply_func(board, move)
+            rebels, officers = Bitboard.from_board(next_board)
+            key, mirrored = Bitboard.canonical(rebels, officers, not is_rebel)
+            value = self.value_cache.get(key)
+            if value is not None:
+                values[i] = value
+                continue
+            # 总是评估规范方向的棋盘，保证镜像局面得到同一个值
+            if mirrored:
+                next_board = [row[::-1] for row in next_board]
+            pending.append((i, key))
             next_states.append(self.board_to_tensor(next_board))
         
-        batch = torch.cat(next_states, dim=0)
-        with torch.no_grad():
-            values = self.net(batch).squeeze()
-            
-        if values.ndim == 0:
-            return moves[0]
+        if next_states:
+            batch = torch.cat(next_states, dim=0)
+            with torch.no_grad():
+                outputs = self.net(batch).view(-1).tolist()
+            if len(self.value_cache) + len(pending) > VALUE_CACHE_SIZE:
+                self.value_cache.clear()
+            for (i, key), value in zip(pending, outputs):
+                values[i] = value
+                self.value_cache[key] = value
+        values = torch.tensor(values)
             
         # 假设模型输出 >0 对叛军有利，<0 对警官有利
         #  Rebel selects max value, Officer selects min value
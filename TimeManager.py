@@ -0,0 +1,87 @@
+"""
+Time management for iterative deepening.
+
+The rules give every move 10 seconds and `TIME_LIMIT` stays the hard limit:
+the Searcher aborts an iteration that runs past it. Most moves do not need
+that long, so the TimeManager gives each move a smaller *budget*:
+
+* game phase: the opening is mostly covered by the opening book and quiet,
+  the middlegame decides the game, and endgame trees are small;
+* branching factor: with few legal moves every depth is cheap, and the
+  choice matters less;
+* forced moves (a single legal move) are played without a search at all by
+  get_best_*_move, so they never reach the time manager.
+
+Before every new depth it predicts how long that depth will take from how
+fast the last iterations grew, and only starts it if it should finish
+within the budget. An iteration
+that is started but cannot finish is pure waste, because only completed
+iterations are used.
+"""
+
+import time
+
+import Bitboard
+
+# Budget factors by game phase
+OPENING_FACTOR = 0.5
+MIDDLEGAME_FACTOR = 1.0
+ENDGAME_FACTOR = 0.7
+# Never budget less than this share of the hard limit
+MIN_BUDGET_FRACTION = 0.15
+# Growth of the iteration time from one depth to the next: used before two
+# iterations have been timed, and the bounds for the measured factor
+DEFAULT_GROWTH = 4.0
+MIN_GROWTH = 1.5
+MAX_GROWTH = 10.0
+# Iterations faster than this are too noisy to measure growth from
+MIN_MEASURABLE = 0.002
+# A depth is only started if even this many times the predicted duration
+# would stay within the hard limit (the growth jumps between odd and even depths)
+SAFETY_FACTOR = 2.0
+
+
+class TimeManager:
+
+    def __init__(self, time_limit, start_time=None):
+        """time_limit: hard limit per move in seconds; start_time: when the move's clock started."""
+        self.time_limit = time_limit
+        self.start_time = start_time if start_time is not None else time.time()
+        self.budget = time_limit
+
+    def allocate(self, pos, num_moves):
+        """Set and return the time budget for a search of `pos` with `num_moves` root moves."""
+        rebel_count = Bitboard.popcount(pos.rebels)
+        in_fortress = Bitboard.popcount(pos.rebels & Bitboard.FORTRESS_MASK)
+        if rebel_count >= 22 and in_fortress <= 2:
+            phase = OPENING_FACTOR
+        elif rebel_count <= 12:
+            phase = ENDGAME_FACTOR
+        else:
+            phase = MIDDLEGAME_FACTOR
+        # 2 moves -> 0.5, 10 or more -> 1.0
+        branching = min(1.0, 0.4 + 0.06 * num_moves)
+        self.budget = max(MIN_BUDGET_FRACTION, phase * branching) * self.time_limit
+        return self.budget
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def predict_next(self, iteration_times):
+        """
+        Expected duration of the next iteration, given the durations of the
+        completed ones: the last one times the larger of the last two growth
+        factors.
+        """
+        growths = [iteration_times[i] / iteration_times[i - 1]
+                   for i in range(max(1, len(iteration_times) - 2), len(iteration_times))
+                   if iteration_times[i - 1] >= MIN_MEASURABLE]
+        growth = max(growths) if growths else DEFAULT_GROWTH
+        return iteration_times[-1] * min(MAX_GROWTH, max(MIN_GROWTH, growth))
+
+    def start_next_depth(self, iteration_times):
+        """True if another iteration is expected to finish within the budget (and safely within the limit)."""
+        elapsed = self.elapsed()
+        predicted = self.predict_next(iteration_times)
+        return (elapsed + predicted <= self.budget
+                and elapsed + SAFETY_FACTOR * predicted <= self.time_limit)
@@ -0,0 +1,135 @@
+"""
+Bounded transposition table for the minimax search.
+
+Positions are keyed by the Zobrist hash kept up to date by
+`Bitboard.Position.make` / `unmake` (side to move included). The Searcher
+uses the canonical key (`Position.canonical_key`), so a position and its
+left-right mirror image share one entry; best moves are stored in the
+canonical orientation and mirrored back on probe.
+
+Replacement policy
+------------------
+The table has `size` buckets (a power of two) of two slots each, indexed by
+the low bits of the key:
+
+* slot 0 is *depth-preferred*: a new entry replaces it if the stored entry
+  can no longer be reached (see below), or else only if it was searched at
+  least as deep as the stored one. Tables that never call `set_reachable`
+  also replace entries from an older search (generation).
+* slot 1 is *always-replace*: anything that does not go into slot 0 lands
+  here, so recent shallow results are still available.
+
+Unreachable entries
+-------------------
+Rebels never move backwards and captured rebels never come back, so along
+a game both the rebel count and the sum of the rebels' rows only go down.
+Every entry remembers both. Before each move of a long-lived table
+(Team20.Player keeps one per side) `set_reachable` records the current
+count and row sum; entries above either can never occur again, so `store`
+overwrites them before any other entry, however deep they were searched.
+`probe` needs no check: a matching key already implies the same count and
+rows. No sweep over the table is needed.
+
+Scores are stored from the point of view of the searcher that owns the table
+(the maximizing side). Win scores (10000 + remaining depth) are stored
+relative to the node so they stay correct when the position is reached again
+at another remaining depth.
+"""
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+DEFAULT_SIZE = 1 << 17
+REACHABLE_ALL = 1 << 30
+WIN_THRESHOLD = 9000
+
+
+class TranspositionTable:
+
+    def __init__(self, size=DEFAULT_SIZE):
+        # Round down to a power of two so the index is a simple mask
+        size = max(1, size)
+        self.size = 1 << (size.bit_length() - 1)
+        self.mask = self.size - 1
+        self.generation = 0
+        self.clear()
+        self.set_reachable(REACHABLE_ALL, REACHABLE_ALL)
+
+    def clear(self):
+        # Each slot holds (key, depth, flag, score, best_move, generation, rebel_count, rows) or None
+        self.slots0 = [None] * self.size
+        self.slots1 = [None] * self.size
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self):
+        """Age all entries; without reachability bounds older generations are replaced first."""
+        self.generation += 1
+
+    def set_reachable(self, rebel_count, rows):
+        """Positions with more rebels or a larger row sum than this can no longer be reached."""
+        self.max_rebel_count = rebel_count
+        self.max_rows = rows
+
+    def probe(self, key):
+        """Return the stored entry for `key` or None."""
+        self.probes += 1
+        i = key & self.mask
+        entry = self.slots0[i]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        other = self.slots1[i]
+        if other is not None and other[0] == key:
+            self.hits += 1
+            return other
+        if entry is not None or other is not None:
+            # Bucket is occupied by different positions
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, flag, score, best_move, rebel_count=0, rows=0):
+        self.stores += 1
+        i = key & self.mask
+        entry = (key, depth, flag, score, best_move, self.generation, rebel_count, rows)
+        old = self.slots0[i]
+        if (old is None or old[0] == key
+                or old[6] > self.max_rebel_count or old[7] > self.max_rows
+                or depth >= old[1]
+                or (old[5] != self.generation and self.max_rows == REACHABLE_ALL)):
+            self.slots0[i] = entry
+        else:
+            self.slots1[i] = entry
+
+    def stats(self):
+        return {
+            'probes': self.probes,
+            'hits': self.hits,
+            'cutoffs': self.cutoffs,
+            'collisions': self.collisions,
+            'stores': self.stores,
+        }
+
+
+def score_to_tt(score, depth):
+    """Make win scores independent of the remaining depth before storing."""
+    if score > WIN_THRESHOLD:
+        return score - depth
+    if score < -WIN_THRESHOLD:
+        return score + depth
+    return score
+
+
+def score_from_tt(score, depth):
+    if score > WIN_THRESHOLD:
+        return score + depth
+    if score < -WIN_THRESHOLD:
+        return score - depth
+    return score